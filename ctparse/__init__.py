@@ -7,4 +7,14 @@ __author__ = """Sebastian Mika"""
 __email__ = "sebastian.mika@comtravo.com"
 __version__ = "__version__ = '0.3.6'"
 
-from ctparse.ctparse import ctparse, ctparse_gen  # noqa
+from ctparse.cache import ParseCache  # noqa
+from ctparse.ctparse import (  # noqa
+    clear_cache,
+    ctparse,
+    ctparse_batch,
+    ctparse_document,
+    ctparse_gen,
+    preload,
+    set_regex_cache,
+)
+from ctparse.parallel import ParallelParser  # noqa
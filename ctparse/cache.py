@@ -0,0 +1,150 @@
+"""Bounded caches used to avoid repeating work in ctparse."""
+from collections import OrderedDict
+from datetime import datetime
+from threading import RLock
+from time import monotonic
+from typing import Any, Hashable, List, NamedTuple, Optional, Tuple, cast
+
+CacheInfo = NamedTuple(
+    "CacheInfo", [("hits", int), ("misses", int), ("maxsize", int), ("currsize", int)]
+)
+
+# stored instead of results for search keys whose results depend on the
+# reference time; the results are then stored per reference time
+_TS_DEPENDENT = object()
+
+# expiry time, cost and value of a cache entry
+_Entry = Tuple[float, int, Any]
+
+
+class LRUCache:
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        max_cost: Optional[int] = None,
+    ) -> None:
+        """A bounded mapping that evicts the least recently used entries.
+
+        The cache can be shared among threads.
+
+        :param maxsize: maximal number of entries; the least recently used
+                        entry is evicted when it is exceeded
+        :param ttl: if given, entries expire *ttl* seconds after they have been
+                    stored
+        :param max_cost: if given, maximal total cost of the entries, see
+                         `put`; least recently used entries are evicted when
+                         it is exceeded and an entry costing more is not stored
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_cost = max_cost
+        self.hits = 0
+        self.misses = 0
+        self._cost = 0
+        self._entries = OrderedDict()  # type: OrderedDict[Hashable, _Entry]
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def cache_info(self) -> CacheInfo:
+        """Return hit and miss statistics and the current size of the cache."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._cost = 0
+            self.hits = 0
+            self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the value stored for *key*, or None."""
+        with self._lock:
+            value = self._get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, cost: int = 1) -> None:
+        """Store *value* for *key*, at a *cost* counted against max_cost."""
+        with self._lock:
+            self._put(key, value, cost)
+
+    # _get and _put must be called with the lock held
+
+    def _get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, _, value = entry
+        if self.ttl is not None and expires < monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: Hashable, value: Any, cost: int = 1) -> None:
+        self._remove(key)
+        if self.max_cost is not None and cost > self.max_cost:
+            return
+        expires = monotonic() + self.ttl if self.ttl is not None else 0.0
+        self._entries[key] = (expires, cost, value)
+        self._cost += cost
+        while len(self._entries) > self.maxsize or (
+            self.max_cost is not None and self._cost > self.max_cost
+        ):
+            self._cost -= self._entries.popitem(last=False)[1][1]
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._cost -= entry[1]
+
+
+class ParseCache(LRUCache):
+    """A bounded cache for the parses produced by ctparse.
+
+    Pass the same instance via the ``cache`` parameter of ctparse or
+    ctparse_gen to reuse the parses of texts seen before. Entries are keyed
+    on the preprocessed text, the scorer and the search parameters. The
+    reference time is only part of the key if a rule using it was applied
+    while parsing the text. Only the results of searches that did not time
+    out are cached. The cache assumes deterministic scorers that do not
+    depend on the reference time.
+
+    :param maxsize: maximal number of entries; the least recently used
+                    entry is evicted when it is exceeded
+    :param ttl: if given, entries expire *ttl* seconds after they have been
+                stored
+    """
+
+    def lookup(self, key: Hashable, ts: datetime) -> Optional[List[Any]]:
+        """Return the results stored for *key* and reference time *ts*, or None."""
+        with self._lock:
+            value = self._get(key)
+            if value is _TS_DEPENDENT:
+                value = self._get((key, ts))
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return cast(Optional[List[Any]], value)
+
+    def store(
+        self, key: Hashable, ts: datetime, ts_dependent: bool, value: List[Any]
+    ) -> None:
+        """Store *value* for *key*, and for *ts* if *ts_dependent* is True."""
+        with self._lock:
+            if ts_dependent:
+                self._put(key, _TS_DEPENDENT)
+                self._put((key, ts), value)
+            else:
+                self._put(key, value)
@@ -0,0 +1,246 @@
+"""Chart parser for the production rules.
+
+The rules in `ctparse.rule.rules` are patterns over adjacent artifacts, i.e.
+they form a grammar whose terminals are the regular expression matches in a
+text. The search in `ctparse.ctparse._ctparse` applies them to sequences of
+regular expression matches and derives each artifact again in every sequence
+and partial parse that contains it. The chart instead holds each artifact once
+per pair of regular expression matches it spans, together with the best scored
+derivation of it. A rule is applied to every chain of adjacent chart items
+exactly once, so shared sub-derivations are computed once and the work is
+polynomial in the number of regular expression matches.
+
+The derivation of an artifact is linearized as in the search: the ids of the
+regular expressions it was produced from followed by the names of the rules in
+the order they were applied. The search applies the rules to whichever partial
+parse scores best, which interleaves the derivations of adjacent artifacts in
+order of their scores. The chart puts the rules of the derivations of the
+items a rule is applied to in the best scored of all orders of these items,
+followed by the rule itself.
+
+The chart is not a drop-in replacement for the search. The search scores a
+production by all rules of the partial parse it is part of, including those
+that produced the other artifacts in the same sequence of regular expression
+matches, while the chart scores each item by its own derivation only. The
+search furthermore prunes its stack and emits the artifacts of partial parses
+no rule applies to anymore, whereas the chart emits the items that no rule was
+applied to. Whenever the chart holds the derivation of the best parse of the
+search, the best parses agree; on the corpora in this repository that is the
+case for about two thirds of the texts and the best parses differ for about
+3% of them.
+"""
+import copy
+import itertools
+from collections import deque
+from datetime import datetime
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from ctparse.partial_parse import PartialParse
+from ctparse.rule import (
+    Predicate,
+    rules as global_rules,
+    rule_positions,
+    _ts_dependent_rules as global_ts_dependent_rules,
+)
+from ctparse.types import Artifact, RegexMatch
+
+
+class ChartItem:
+    __slots__ = ("first", "last", "artifact", "regex_ids", "rule_names", "score")
+
+    def __init__(
+        self,
+        first: int,
+        last: int,
+        artifact: Artifact,
+        regex_ids: Tuple[int, ...],
+        rule_names: Tuple[str, ...],
+    ) -> None:
+        """An *artifact* spanning the regular expression matches *first* to
+        *last* (inclusive) in the chart, with the regular expression ids and
+        the names of the rules of its best scored derivation so far.
+        """
+        self.first = first
+        self.last = last
+        self.artifact = artifact
+        self.regex_ids = regex_ids
+        self.rule_names = rule_names
+        self.score = 0.0
+
+    @property
+    def rules(self) -> Tuple[Union[int, str], ...]:
+        """The derivation as in PartialParse.rules."""
+        return self.regex_ids + self.rule_names
+
+    def partial_parse(self) -> PartialParse:
+        """A partial parse with only the artifact and its derivation."""
+        return PartialParse((self.artifact,), self.rules)
+
+    def __repr__(self) -> str:
+        return "ChartItem({}, {}, {}, {})".format(
+            self.first, self.last, repr(self.artifact), repr(self.rules)
+        )
+
+
+class Chart:
+    def __init__(
+        self, regex_matches: Sequence[RegexMatch], succ: Sequence[Sequence[int]]
+    ) -> None:
+        """Chart of the artifacts that can be produced from *regex_matches*.
+
+        :param regex_matches: the regular expression matches, sorted by their
+                              start, see ctparse._match_regex
+        :param succ: for each match the indices of the matches that can follow
+                     it in a sequence, see ctparse._regex_successors
+        """
+        self.regex_matches = regex_matches
+        self._succ = succ
+        self._pred = [[] for _ in regex_matches]  # type: List[List[int]]
+        for i, js in enumerate(succ):
+            for j in js:
+                self._pred[j].append(i)
+        # the items by (first, last, artifact) in the order they were added
+        self.items = {}  # type: Dict[Tuple[int, int, Artifact], ChartItem]
+        # processed items by the index of their first and last match
+        self._by_first = [[] for _ in regex_matches]  # type: List[List[ChartItem]]
+        self._by_last = [[] for _ in regex_matches]  # type: List[List[ChartItem]]
+        # keys of the items that are part of a chain a rule produced from
+        self._used = set()  # type: Set[Tuple[int, int, Artifact]]
+        # True if a rule that uses ts was applied
+        self.ts_dependent = False
+
+    def build(
+        self,
+        ts: datetime,
+        score_batch: Callable[[Sequence[PartialParse]], Sequence[float]],
+        on_do_iter: Callable[[], None] = lambda: None,
+    ) -> None:
+        """Apply the rules until no new artifact can be produced.
+
+        Items are processed in the order they are added. Each processed item
+        is combined with all chains of adjacent processed items the pattern of
+        a rule accepts, hence each chain is tried exactly once: when the last
+        of its items is processed. The derivations of the items in a chain are
+        scored in all orders and the best scored is kept, as is the derivation
+        with the higher score according to *score_batch* if an artifact is
+        produced again on the same span. on_do_iter is called before an item
+        is processed.
+        """
+        agenda = deque()  # type: Deque[ChartItem]
+        for i, m in enumerate(self.regex_matches):
+            item = ChartItem(i, i, m, (m.id,), ())
+            self.items[(i, i, m)] = item
+            agenda.append(item)
+        while agenda:
+            on_do_iter()
+            x = agenda.popleft()
+            self._by_first[x.first].append(x)
+            self._by_last[x.last].append(x)
+            new = []  # type: List[ChartItem]
+            for r_name, pos in rule_positions(x.artifact):
+                production, patterns = global_rules[r_name]
+                for chain in self._chains(x, patterns, pos):
+                    res = self._apply(ts, production, [c.artifact for c in chain])
+                    self.ts_dependent |= r_name in global_ts_dependent_rules
+                    if res is None:
+                        continue
+                    self._used.update((c.first, c.last, c.artifact) for c in chain)
+                    regex_ids = sum((c.regex_ids for c in chain), ())
+                    orders = {
+                        sum((c.rule_names for c in order), ()) + (r_name,)
+                        for order in itertools.permutations(chain)
+                    }
+                    new.extend(
+                        ChartItem(chain[0].first, chain[-1].last, res, regex_ids, o)
+                        for o in sorted(orders)
+                    )
+            scores = score_batch([n.partial_parse() for n in new])
+            # best first, the first derivation of an artifact is added
+            for n, score in sorted(zip(new, scores), key=lambda ns: -ns[1]):
+                n.score = score
+                key = (n.first, n.last, n.artifact)
+                old = self.items.get(key)
+                if old is None:
+                    self.items[key] = n
+                    agenda.append(n)
+                elif old.score < score:
+                    # items already produced from old keep its derivation
+                    old.regex_ids = n.regex_ids
+                    old.rule_names = n.rule_names
+                    old.score = score
+
+    def final_items(self) -> List[ChartItem]:
+        """The produced items that no rule was applied to, in the order they
+        were added.
+        """
+        return [
+            item
+            for key, item in self.items.items()
+            if key not in self._used and not isinstance(item.artifact, RegexMatch)
+        ]
+
+    @staticmethod
+    def _apply(
+        ts: datetime,
+        production: Callable[..., Optional[Artifact]],
+        args: List[Artifact],
+    ) -> Optional[Artifact]:
+        # Rules that return one of their arguments update its span in place,
+        # which would change that item in the chart. Such a result is replaced
+        # by a copy with the new span and the argument gets its span back.
+        spans = [(a.mstart, a.mend) for a in args]
+        res = production(ts, *args)
+        for a, (mstart, mend) in zip(args, spans):
+            if res is a:
+                res = copy.copy(a)
+                a.mstart, a.mend = mstart, mend
+        return res
+
+    def _chains(
+        self, x: ChartItem, patterns: Sequence[Predicate], pos: int
+    ) -> Iterator[List[ChartItem]]:
+        # all chains of processed items with x at position pos that are
+        # accepted by patterns
+        for left in self._left(x.first, patterns[:pos]):
+            for right in self._right(x.last, patterns[pos + 1 :]):
+                yield left + [x] + right
+
+    def _left(
+        self, first: int, patterns: Sequence[Predicate]
+    ) -> Iterator[List[ChartItem]]:
+        # chains accepted by patterns that end right before match first
+        if not patterns:
+            yield []
+            return
+        p = patterns[-1]
+        for i in self._pred[first]:
+            for item in self._by_last[i]:
+                if p(item.artifact):
+                    for chain in self._left(item.first, patterns[:-1]):
+                        chain.append(item)
+                        yield chain
+
+    def _right(
+        self, last: int, patterns: Sequence[Predicate]
+    ) -> Iterator[List[ChartItem]]:
+        # chains accepted by patterns that start right after match last
+        if not patterns:
+            yield []
+            return
+        p = patterns[0]
+        for j in self._succ[last]:
+            for item in self._by_first[j]:
+                if p(item.artifact):
+                    for chain in self._right(item.last, patterns[1:]):
+                        yield [item] + chain
@@ -1,5 +1,5 @@
 from collections import defaultdict
-from typing import Dict, Sequence, Tuple, Optional
+from typing import Dict, Mapping, Sequence, Tuple, Optional
 
 
 class CountVectorizer:
@@ -17,7 +17,7 @@ class CountVectorizer:
             n-gram range to consider
         """
         self.ngram_range = ngram_range
-        self.vocabulary: Optional[Dict[str, int]] = None
+        self.vocabulary: Optional[Mapping[str, int]] = None
 
     @staticmethod
     def _create_ngrams(
@@ -113,7 +113,7 @@ class CountVectorizer:
 
     @staticmethod
     def _create_feature_matrix(
-        vocabulary: Dict[str, int], count_matrix: Sequence[Dict[str, int]]
+        vocabulary: Mapping[str, int], count_matrix: Sequence[Dict[str, int]]
     ) -> Sequence[Dict[int, int]]:
         """Map counts of string features to numerical data (sparse maps of
         `{feature_index: count}`). Here `feature_index` is relative to the vocabulary of
@@ -121,7 +121,7 @@ class CountVectorizer:
 
         Parameters
         ----------
-        vocabulary : Dict[str, int]
+        vocabulary : Mapping[str, int]
             Vocabulary with {feature: index} mappings
 
         count_matrix : Sequence[Dict[str, int]]
@@ -1,7 +1,13 @@
 import logging
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Executor
+from copy import deepcopy
 from datetime import datetime
+from functools import partial
+from threading import Lock
 from typing import (
     cast,
+    Any,
     Callable,
     Dict,
     Iterator,
@@ -14,8 +20,17 @@ from typing import (
 
 import regex
 
-from ctparse.partial_parse import PartialParse
-from ctparse.rule import _regex as global_regex
+from ctparse.cache import LRUCache, ParseCache
+from ctparse.chart import Chart
+from ctparse.partial_parse import BeamFrontier, Frontier, PartialParse
+from ctparse.prefilter import Requirements, may_match, text_features
+from ctparse.rule import (
+    _regex as global_regex,
+    _regex_prefilter as global_prefilter,
+    rules as global_rules,
+    _ts_dependent_rules as global_ts_dependent_rules,
+    rules_starting_with,
+)
 from ctparse.scorer import Scorer
 from ctparse.timers import CTParseTimeoutError, timeit, timeout as timeout_
 from ctparse.time.postprocess_latent import apply_postprocessing_rules
@@ -24,7 +39,60 @@ from ctparse.loader import load_default_scorer
 
 logger = logging.getLogger(__name__)
 
-_DEFAULT_SCORER = load_default_scorer()
+# loaded on first use, see _default_scorer
+_DEFAULT_SCORER = None  # type: Optional[Scorer]
+_DEFAULT_SCORER_LOCK = Lock()
+
+# regex stage output of recently parsed texts, see _ctparse and
+# set_regex_cache; None if turned off
+_front_cache = LRUCache(maxsize=1024, max_cost=1 << 20)  # type: Optional[LRUCache]
+
+
+def _default_scorer() -> Scorer:
+    global _DEFAULT_SCORER
+    with _DEFAULT_SCORER_LOCK:
+        if _DEFAULT_SCORER is None:
+            _DEFAULT_SCORER = load_default_scorer()
+        return _DEFAULT_SCORER
+
+
+def preload() -> None:
+    """Load the default scorer now instead of on the first parse.
+
+    Importing ctparse does not load the model of the default scorer; this is
+    done when it is first needed. Call this function to pay that cost up front,
+    e.g. when starting a server or before forking worker processes.
+    """
+    _default_scorer()
+
+
+def set_regex_cache(maxsize: int = 1024, max_matches: int = 1 << 20) -> None:
+    """Configure the cache of the regular expression stage.
+
+    The regular expression matches of a text and the sequences of them the
+    search starts from do not depend on the reference time. They are cached
+    for recently parsed texts and shared by all threads. The number of
+    sequences can grow exponentially with the length of a text, hence the
+    cache is bounded in the total number of matches in all cached sequences
+    as well. Existing entries are dropped.
+
+    :param maxsize: maximal number of cached texts; 0 turns the cache off
+    :param max_matches: maximal total number of matches in the cached
+                        sequences; the sequences of a text with more matches
+                        are not cached
+    """
+    global _front_cache
+    if maxsize > 0:
+        _front_cache = LRUCache(maxsize=maxsize, max_cost=max_matches)
+    else:
+        _front_cache = None
+
+
+def clear_cache() -> None:
+    """Drop all entries from the cache of the regular expression stage."""
+    front_cache = _front_cache
+    if front_cache is not None:
+        front_cache.clear()
 
 
 class CTParse:
@@ -64,6 +132,10 @@ def ctparse(
     max_stack_depth: int = 10,
     scorer: Optional[Scorer] = None,
     latent_time: bool = True,
+    cache: Optional[ParseCache] = None,
+    beam_width: int = 0,
+    max_expansions: int = 0,
+    chart: bool = False,
 ) -> Optional[CTParse]:
     """Parse a string *txt* into a time expression
 
@@ -86,6 +158,26 @@ def ctparse(
     :param latent_time: if True, resolve expressions that contain only a time
                         (e.g. 8:00 pm) to be the next matching time after
                         reference time *ts*
+    :param cache: if given, a `ParseCache` used to look up and store the parses
+                  of *txt*
+    :param beam_width: if > 0, use beam search: instead of limiting the total
+                       number of candidate productions to *max_stack_depth*,
+                       keep at most *beam_width* of them per covered span of
+                       text (default=0)
+    :type beam_width: int
+    :param max_expansions: limit the number of candidate productions that rules
+                           are applied to (default=0); once reached, the
+                           remaining candidates are emitted as they are. Unlike
+                           *timeout* this bounds the work per text independent
+                           of the machine; set to 0 to not limit
+    :type max_expansions: int
+    :param chart: if True, parse with the chart parser (see `ctparse.chart`)
+                  instead of searching; *relative_match_len*,
+                  *max_stack_depth*, *beam_width* and *max_expansions* are
+                  then ignored (default=False). The chart scores productions
+                  differently and its best parse is not always that of the
+                  search
+    :type chart: bool
     :returns: Optional[CTParse]
     """
     parsed = ctparse_gen(
@@ -96,6 +188,10 @@ def ctparse(
         max_stack_depth=max_stack_depth,
         scorer=scorer,
         latent_time=latent_time,
+        cache=cache,
+        beam_width=beam_width,
+        max_expansions=max_expansions,
+        chart=chart,
     )
     # TODO: keep debug for back-compatibility, but remove it later
     if debug:
@@ -118,34 +214,219 @@ def ctparse_gen(
     max_stack_depth: int = 10,
     scorer: Optional[Scorer] = None,
     latent_time: bool = True,
+    cache: Optional[ParseCache] = None,
+    beam_width: int = 0,
+    max_expansions: int = 0,
+    chart: bool = False,
 ) -> Iterator[Optional[CTParse]]:
     """Generate parses for the string *txt*.
 
     This function is equivalent to ctparse, with the exception that it returns an
     iterator over the matches as soon as they are produced.
+
+    The default best-first search expands the candidate productions with the
+    longest coverage and highest score first, keeping the *max_stack_depth*
+    best. Its work and hence its latency can vary a lot between texts. Beam
+    search (*beam_width* > 0) keeps the best candidates of each covered span
+    instead, so that alternative readings of one part of the text do not crowd
+    out the others; combined with *max_expansions* the work per text is
+    bounded.
+
+    The chart parser (*chart* = True) derives each artifact only once per span
+    of regular expression matches instead of once per sequence and partial
+    parse containing it. It is exhaustive, yet its work grows polynomially
+    with the number of matches, where that of an unlimited search grows
+    exponentially. It generates the productions no rule applies to, each with
+    its best scored derivation.
     """
     if scorer is None:
-        scorer = _DEFAULT_SCORER
+        scorer = _default_scorer()
     if ts is None:
         ts = datetime.now()
-    for parse in _ctparse(
-        _preprocess_string(txt),
+    return _ctparse_gen(
+        txt,
         ts,
         timeout=timeout,
         relative_match_len=relative_match_len,
         max_stack_depth=max_stack_depth,
         scorer=scorer,
-    ):
+        latent_time=latent_time,
+        cache=cache,
+        beam_width=beam_width,
+        max_expansions=max_expansions,
+        chart=chart,
+    )
+
+
+def _ctparse_gen(
+    txt: str,
+    ts: datetime,
+    timeout: float,
+    relative_match_len: float,
+    max_stack_depth: int,
+    scorer: Scorer,
+    latent_time: bool,
+    cache: Optional[ParseCache] = None,
+    beam_width: int = 0,
+    max_expansions: int = 0,
+    chart: bool = False,
+) -> Iterator[Optional[CTParse]]:
+    if chart:
+        parses = _ctparse_chart(
+            _preprocess_string(txt), ts, timeout=timeout, scorer=scorer, cache=cache
+        )  # type: Iterator[Optional[CTParse]]
+    else:
+        parses = _ctparse(
+            _preprocess_string(txt),
+            ts,
+            timeout=timeout,
+            relative_match_len=relative_match_len,
+            max_stack_depth=max_stack_depth,
+            scorer=scorer,
+            cache=cache,
+            beam_width=beam_width,
+            max_expansions=max_expansions,
+        )
+    for parse in parses:
         if parse and latent_time:
             # NOTE: we post-process after scoring because the model has been trained
             # without using the latent time. This means also that the post processing
             # step won't be added to the rules
             prod = apply_postprocessing_rules(ts, parse.resolution)
-            parse.resolution = prod
+            parse.resolution = prod.update_span(parse.resolution)
 
         yield parse
 
 
+def ctparse_batch(
+    items: Sequence[Tuple[str, Optional[datetime]]],
+    timeout: Union[int, float] = 1.0,
+    relative_match_len: float = 1.0,
+    max_stack_depth: int = 10,
+    scorer: Optional[Scorer] = None,
+    latent_time: bool = True,
+    cache: Optional[ParseCache] = None,
+    beam_width: int = 0,
+    max_expansions: int = 0,
+    chart: bool = False,
+) -> List[Optional[CTParse]]:
+    """Parse a sequence of ``(txt, ts)`` pairs.
+
+    This is equivalent to calling ctparse on each pair, except that a *ts* of
+    None is replaced by the same current time for all items.
+
+    All other parameters are as for ctparse, *timeout* applies per item.
+
+    :returns: List[Optional[CTParse]] with the highest scoring parse (or None)
+              for each item, in input order
+    """
+    if scorer is None:
+        scorer = _default_scorer()
+    now = datetime.now()
+    return [
+        _ctparse_best(
+            txt,
+            ts=now if ts is None else ts,
+            timeout=timeout,
+            relative_match_len=relative_match_len,
+            max_stack_depth=max_stack_depth,
+            scorer=scorer,
+            latent_time=latent_time,
+            cache=cache,
+            beam_width=beam_width,
+            max_expansions=max_expansions,
+            chart=chart,
+        )
+        for txt, ts in items
+    ]
+
+
+def ctparse_document(
+    txt: str,
+    ts: Optional[datetime] = None,
+    timeout: Union[int, float] = 1.0,
+    relative_match_len: float = 1.0,
+    max_stack_depth: int = 10,
+    scorer: Optional[Scorer] = None,
+    latent_time: bool = True,
+    executor: Optional[Executor] = None,
+) -> List[CTParse]:
+    """Parse all time expressions in a longer document *txt*.
+
+    Instead of treating the whole document as one search problem, the text is
+    split into windows of regular expression matches that are only separated by
+    whitespace. Each window is parsed independently and its highest scoring
+    parse is returned. The ``mstart`` and ``mend`` attributes of each resolution
+    are character offsets into the original *txt*.
+
+    All other parameters are as for ctparse, *timeout* applies per window.
+
+    :param executor: if given, an `concurrent.futures.Executor` used to parse
+                     the windows in parallel
+    :returns: List[CTParse] ordered by position in *txt*
+    """
+    if scorer is None:
+        scorer = _default_scorer()
+    if ts is None:
+        ts = datetime.now()
+    pre_txt, spans = _preprocess_string_spans(txt)
+    windows = _document_windows(
+        pre_txt, _match_regex(pre_txt, global_regex, global_prefilter)
+    )
+    logger.debug("document split into {} windows".format(len(windows)))
+    parse_window = partial(
+        _ctparse_best,
+        ts=ts,
+        timeout=timeout,
+        relative_match_len=relative_match_len,
+        max_stack_depth=max_stack_depth,
+        scorer=scorer,
+        latent_time=latent_time,
+    )
+    window_txts = [pre_txt[w_start:w_end] for w_start, w_end in windows]
+    if executor is None:
+        results = map(parse_window, window_txts)  # type: Iterator[Optional[CTParse]]
+    else:
+        results = executor.map(parse_window, window_txts)
+    parses = []
+    for (w_start, _), parse in zip(windows, results):
+        if parse is None:
+            continue
+        res = parse.resolution
+        if res.mend > res.mstart:
+            res.mstart = spans[w_start + res.mstart][0]
+            res.mend = spans[w_start + res.mend - 1][1]
+        parses.append(parse)
+    return parses
+
+
+def _ctparse_best(txt: str, **kwargs: Any) -> Optional[CTParse]:
+    # highest scoring parse for *txt*, None if there is none; on ties the
+    # parse produced last wins, as in ctparse
+    parses = [p for p in _ctparse_gen(txt, **kwargs) if p]
+    if not parses:
+        return None
+    parses.sort(key=lambda p: p.score)
+    return parses[-1]
+
+
+def _document_windows(
+    txt: str, regex_matches: List[RegexMatch]
+) -> List[Tuple[int, int]]:
+    # Split *txt* into windows (start, end) of regex matches that overlap or
+    # are only separated by whitespace, i.e. that _regex_stack could combine
+    # into one sequence. Assumes regex_matches are sorted by start index.
+    windows = []  # type: List[Tuple[int, int]]
+    for m in regex_matches:
+        if windows:
+            w_start, w_end = windows[-1]
+            if m.mstart <= _separator_regex.match(txt, w_end).end():
+                windows[-1] = (w_start, max(w_end, m.mend))
+                continue
+        windows.append((m.mstart, m.mend))
+    return windows
+
+
 def _ctparse(
     txt: str,
     ts: datetime,
@@ -153,117 +434,252 @@ def _ctparse(
     relative_match_len: float,
     max_stack_depth: int,
     scorer: Scorer,
+    cache: Optional[ParseCache] = None,
+    beam_width: int = 0,
+    max_expansions: int = 0,
 ) -> Iterator[Optional[CTParse]]:
     t_fun = timeout_(timeout)
 
-    try:
-        logger.debug("=" * 80)
-        logger.debug("-> matching regular expressions")
-        p, _tp = timeit(_match_regex)(txt, global_regex)
-        logger.debug("time in _match_regex: {:.0f}ms".format(1000 * _tp))
+    cache_key = (
+        txt,
+        scorer,
+        relative_match_len,
+        max_stack_depth,
+        beam_width,
+        max_expansions,
+    )
+    if cache is not None:
+        cached = cache.lookup(cache_key, ts)
+        if cached is not None:
+            logger.debug("-> {} parses from cache".format(len(cached)))
+            # copies, as callers may modify the parses
+            yield from deepcopy(cached)
+            return
+    # parses emitted so far, to be stored in the cache
+    emitted = []  # type: List[CTParse]
 
-        logger.debug("=" * 80)
-        logger.debug("-> building initial stack")
-        regex_stack, _ts = timeit(_regex_stack)(txt, p, t_fun)
-        logger.debug("time in _regex_stack: {:.0f}ms".format(1000 * _ts))
-        # add empty production path + counter of contained regex
-        stack = [PartialParse.from_regex_matches(s) for s in regex_stack]
+    try:
+        # the regex matches, the initial stack and the rules applicable to it
+        # do not depend on ts; the registry sizes are part of the key in case
+        # rules are added later on
+        front_key = (txt, len(global_regex), len(global_rules))
+        front_cache = _front_cache
+        front = front_cache.get(front_key) if front_cache is not None else None
+        if front is None:
+            logger.debug("=" * 80)
+            logger.debug("-> matching regular expressions")
+            p, _tp = timeit(_match_regex)(txt, global_regex, global_prefilter)
+            logger.debug("time in _match_regex: {:.0f}ms".format(1000 * _tp))
+
+            logger.debug("=" * 80)
+            logger.debug("-> building initial stack")
+            regex_stack, _ts = timeit(_regex_stack)(txt, p, t_fun)
+            logger.debug("time in _regex_stack: {:.0f}ms".format(1000 * _ts))
+            # add empty production path + counter of contained regex
+            stack = [PartialParse.from_regex_matches(s) for s in regex_stack]
+            front_rules = {
+                tuple(m.id for m in s): pp.applicable_rules
+                for s, pp in zip(regex_stack, stack)
+            }
+            if front_cache is not None:
+                front_cache.put(
+                    front_key,
+                    (regex_stack, front_rules),
+                    cost=sum(len(s) for s in regex_stack) + 1,
+                )
+        else:
+            logger.debug("-> initial stack from cache")
+            # fresh partial parses, the search modifies them
+            regex_stack, front_rules = front
+            stack = [
+                PartialParse.from_regex_matches(s, front_rules) for s in regex_stack
+            ]
         # TODO: the score should be kept separate from the partial parse
         # because it depends also on the text and the ts. A good idea is
         # to create a namedtuple of kind StackElement(partial_parse, score)
-        for pp in stack:
-            pp.score = scorer.score(txt, ts, pp)
+        # ids of the artifacts produced during the search, see
+        # PartialParse.prod_key
+        artifact_ids = {}  # type: Dict[Artifact, int]
+        for pp, score in zip(stack, scorer.score_batch(txt, ts, stack)):
+            pp.score = score
+            pp.artifact_ids = artifact_ids
 
         logger.debug("initial stack length: {}".format(len(stack)))
-        # sort stack by length of covered string and - if that is equal - score
-        # --> last element is longest coverage and highest scored
-        stack.sort()
         # only keep initial stack elements that cover at least
         # relative_match_len characters of what the highest
         # scored/covering stack element does cover
-        stack = [
-            s
-            for s in stack
-            if s.max_covered_chars >= stack[-1].max_covered_chars * relative_match_len
-        ]
+        min_covered_chars = (
+            max(s.max_covered_chars for s in stack) * relative_match_len if stack else 0
+        )
+        stack = [s for s in stack if s.max_covered_chars >= min_covered_chars]
         logger.debug("stack length after relative match length: {}".format(len(stack)))
-        # limit depth of stack
-        stack = stack[-max_stack_depth:]
-        logger.debug("stack length after max stack depth limit: {}".format(len(stack)))
+        # the frontier pops the element with the longest coverage and - if
+        # that is equal - the highest score, and limits the depth of the stack
+        # or in beam search the number of elements per covered span
+        if beam_width > 0:
+            frontier = BeamFrontier(beam_width)  # type: Frontier
+        else:
+            frontier = Frontier(max_stack_depth)
+        frontier.extend(stack)
+        logger.debug(
+            "stack length after max stack depth limit: {}".format(len(frontier))
+        )
+        # the results only depend on ts if a rule that uses ts is applied
+        # during the search
+        ts_dependent = False
 
         # track what has been added to the stack and do not add again
-        # if the score is not better
-        stack_prod = {}  # type: Dict[Tuple[Artifact, ...], float]
-        # track what has been emitted and do not emit again
-        parse_prod = {}  # type: Dict[Artifact, float]
-        while stack:
+        # if the score is not better, by PartialParse.prod_key
+        stack_prod = {}  # type: Dict[Tuple[int, ...], float]
+        # track what has been emitted and do not emit again, by artifact id
+        parse_prod = {}  # type: Dict[int, float]
+        # skip formatting log messages in the search loop unless they are logged
+        debug = logger.isEnabledFor(logging.DEBUG)
+        # number of stack elements rules are still applied to
+        budget = max_expansions if max_expansions > 0 else -1
+        while frontier:
             t_fun()
-            s = stack.pop()
-            logger.debug("-" * 80)
-            logger.debug("producing on {}, score={:.2f}".format(s.prod, s.score))
-            new_stack_elements = []
+            s = frontier.pop()
+            if debug:
+                logger.debug("-" * 80)
+                logger.debug("producing on {}, score={:.2f}".format(s.prod, s.score))
+            candidates = []
+            # positions in s.prod at which each rule can start
+            starts = {}  # type: Dict[str, List[int]]
+            if budget != 0:
+                budget -= 1
+                for i, a in enumerate(s.prod):
+                    for r_name in rules_starting_with(a):
+                        starts.setdefault(r_name, []).append(i)
             for r_name, r in s.applicable_rules.items():
-                for r_match in _match_rule(s.prod, r[1]):
+                if r_name not in starts:
+                    continue
+                for r_match in _match_rule(s.prod, r[1], starts[r_name]):
                     # apply production part of rule
                     new_s = s.apply_rule(ts, r[0], r_name, r_match)
-
-                    # TODO: We should store scores separately from the production itself
-                    # because the score may depend on the text and the ts
+                    ts_dependent |= r_name in global_ts_dependent_rules
                     if new_s is not None:
-                        new_s.score = scorer.score(txt, ts, new_s)
-
-                    if (
-                        new_s
-                        and stack_prod.get(new_s.prod, new_s.score - 1) < new_s.score
-                    ):
-                        # either new_s.prod has never been produced
-                        # before or the score of new_s is higher than
-                        # a previous identical production
-                        new_stack_elements.append(new_s)
+                        candidates.append((r_name, new_s))
+
+            # TODO: We should store scores separately from the production itself
+            # because the score may depend on the text and the ts
+            scores = scorer.score_batch(txt, ts, [new_s for _, new_s in candidates])
+            n_new = 0
+            for (r_name, new_s), score in zip(candidates, scores):
+                new_s.score = score
+                key = new_s.prod_key
+                if stack_prod.get(key, new_s.score - 1) < new_s.score:
+                    # either new_s.prod has never been produced
+                    # before or the score of new_s is higher than
+                    # a previous identical production
+                    n_new += 1
+                    stack_prod[key] = new_s.score
+                    # put on stack, unless it would be truncated right away;
+                    # its prod is then never built
+                    if frontier.push(new_s) and debug:
                         logger.debug(
                             "  {} -> {}, score={:.2f}".format(
                                 r_name, new_s.prod, new_s.score
                             )
                         )
-                        stack_prod[new_s.prod] = new_s.score
-            if not new_stack_elements:
+            if not n_new:
                 logger.debug("~" * 80)
                 logger.debug("no rules applicable: emitting")
                 # no new productions were generated from this stack element.
                 # emit all (probably partial) production
-                for x in s.prod:
-                    if not isinstance(x, RegexMatch):
-                        # TODO: why do we have a different method for scoring
-                        # final productions? This is because you may have non-reducible
-                        # parses of the kind [Time, RegexMatch, Interval] or
-                        # [Time, Time] etc. In this case we want to emit those Time,
-                        # Interval parses separately and score them appropriately
-                        # (the default Scorer.score function only operates on the
-                        # whole PartialParse).
-                        score_x = scorer.score_final(txt, ts, s, x)
-                        # only emit productions not emitted before or
-                        # productions emitted before but scored higher
-                        if parse_prod.get(x, score_x - 1) < score_x:
-                            parse_prod[x] = score_x
-                            logger.debug(
-                                " => {}, score={:.2f}, ".format(x.__repr__(), score_x)
-                            )
-                            yield CTParse(x, s.rules, score_x)
+                # TODO: why do we have a different method for scoring
+                # final productions? This is because you may have non-reducible
+                # parses of the kind [Time, RegexMatch, Interval] or
+                # [Time, Time] etc. In this case we want to emit those Time,
+                # Interval parses separately and score them appropriately
+                # (the default Scorer.score function only operates on the
+                # whole PartialParse).
+                final = [
+                    (x, x_id)
+                    for x, x_id in zip(s.prod, s.prod_key)
+                    if not isinstance(x, RegexMatch)
+                ]
+                final_scores = scorer.score_final_batch(
+                    txt, ts, s, [x for x, _ in final]
+                )
+                for (x, x_id), score_x in zip(final, final_scores):
+                    # only emit productions not emitted before or
+                    # productions emitted before but scored higher
+                    if parse_prod.get(x_id, score_x - 1) < score_x:
+                        parse_prod[x_id] = score_x
+                        logger.debug(
+                            " => {}, score={:.2f}, ".format(x.__repr__(), score_x)
+                        )
+                        parse = CTParse(x, s.rules, score_x)
+                        if cache is not None:
+                            emitted.append(deepcopy(parse))
+                        yield parse
             else:
-                # new productions generated, put on stack and sort
-                # stack by highst score
-                stack.extend(new_stack_elements)
-                stack.sort()
-                stack = stack[-max_stack_depth:]
                 logger.debug(
-                    "added {} new stack elements, depth after trunc: {}".format(
-                        len(new_stack_elements), len(stack)
+                    "added {} new stack elements, depth after trunc: {}".format(
+                        n_new, len(frontier)
                     )
                 )
+        if cache is not None:
+            cache.store(cache_key, ts, ts_dependent, emitted)
+    except CTParseTimeoutError:
+        # do not cache the results, they depend on the time available
+        logger.debug('Timeout on "{}"'.format(txt))
+        return
+
+
+def _ctparse_chart(
+    txt: str,
+    ts: datetime,
+    timeout: float,
+    scorer: Scorer,
+    cache: Optional[ParseCache] = None,
+) -> Iterator[Optional[CTParse]]:
+    # Same as _ctparse, but with the chart parser: the regex matches are put
+    # into a chart, the rules are applied until nothing new is produced and
+    # the productions no rule was applied to are emitted
+    t_fun = timeout_(timeout)
+
+    cache_key = (txt, scorer, "chart")
+    if cache is not None:
+        cached = cache.lookup(cache_key, ts)
+        if cached is not None:
+            logger.debug("-> {} parses from cache".format(len(cached)))
+            yield from deepcopy(cached)
+            return
+
+    try:
+        logger.debug("=" * 80)
+        logger.debug("-> matching regular expressions")
+        p, _tp = timeit(_match_regex)(txt, global_regex, global_prefilter)
+        logger.debug("time in _match_regex: {:.0f}ms".format(1000 * _tp))
+
+        logger.debug("=" * 80)
+        logger.debug("-> building chart")
+        chart = Chart(p, _regex_successors(txt, p)[0])
+        _, _tc = timeit(chart.build)(
+            ts, partial(scorer.score_batch, txt, ts), on_do_iter=t_fun
+        )
+        logger.debug("time in Chart.build: {:.0f}ms".format(1000 * _tc))
+        logger.debug("chart size: {}".format(len(chart.items)))
     except CTParseTimeoutError:
         logger.debug('Timeout on "{}"'.format(txt))
         return
 
+    # emit each production once, with its best score
+    parse_prod = {}  # type: Dict[Artifact, CTParse]
+    for item in chart.final_items():
+        pp = item.partial_parse()
+        score = scorer.score_final_batch(txt, ts, pp, pp.prod)[0]
+        if item.artifact not in parse_prod or parse_prod[item.artifact].score < score:
+            parse_prod[item.artifact] = CTParse(item.artifact, pp.rules, score)
+    emitted = list(parse_prod.values())
+    if cache is not None:
+        cache.store(cache_key, ts, chart.ts_dependent, deepcopy(emitted))
+    for parse in emitted:
+        logger.debug(" => {}, score={:.2f}, ".format(parse.resolution, parse.score))
+        yield parse
+
 
 # replace all comma, semicolon, whitespace, invisible control, opening and
 # closing brackets
@@ -271,50 +687,117 @@ _repl1 = regex.compile(r"[,;\pZ\pC\p{Ps}\p{Pe}]+", regex.VERSION1)
 _repl2 = regex.compile(r"(\p{Pd}|[\u2010-\u2015]|\u2043)+", regex.VERSION1)
 
 
+_separator_regex = regex.compile(r"\s*", regex.VERSION1)
+
+
 def _preprocess_string(txt: str) -> str:
     return cast(
         str, _repl2.sub("-", _repl1.sub(" ", txt, concurrent=True).strip()).strip()
     )
 
 
+def _preprocess_string_spans(txt: str) -> Tuple[str, List[Tuple[int, int]]]:
+    # Same as _preprocess_string, but additionally return for each character
+    # of the result the span of characters in *txt* it originates from.
+    spans = [(i, i + 1) for i in range(len(txt))]
+    txt, spans = _strip_spans(*_sub_spans(_repl1, " ", txt, spans))
+    return _strip_spans(*_sub_spans(_repl2, "-", txt, spans))
+
+
+def _sub_spans(
+    pattern: regex.Regex, repl: str, txt: str, spans: List[Tuple[int, int]]
+) -> Tuple[str, List[Tuple[int, int]]]:
+    # replace each match of pattern by the single character repl
+    new_txt = []
+    new_spans = []  # type: List[Tuple[int, int]]
+    pos = 0
+    for m in pattern.finditer(txt, concurrent=True):
+        new_txt.append(txt[pos : m.start()])
+        new_spans.extend(spans[pos : m.start()])
+        new_txt.append(repl)
+        new_spans.append((spans[m.start()][0], spans[m.end() - 1][1]))
+        pos = m.end()
+    new_txt.append(txt[pos:])
+    new_spans.extend(spans[pos:])
+    return "".join(new_txt), new_spans
+
+
+def _strip_spans(
+    txt: str, spans: List[Tuple[int, int]]
+) -> Tuple[str, List[Tuple[int, int]]]:
+    start = len(txt) - len(txt.lstrip())
+    end = len(txt.rstrip())
+    return txt[start:end], spans[start:end]
+
+
 def _match_rule(
-    seq: Sequence[Artifact], rule: Sequence[Callable[[Artifact], bool]]
+    seq: Sequence[Artifact],
+    rule: Sequence[Callable[[Artifact], bool]],
+    starts: Optional[Sequence[int]] = None,
 ) -> Iterator[Tuple[int, int]]:
+    # Yield the (start, end) spans of seq matched by the patterns in rule.
+    # If given, starts are the positions (ascending) at which the first
+    # pattern is known to match, see rules_starting_with; other positions
+    # are not tried.
     if not seq:
         return
     if not rule:
         return
-    i_r = 0
-    i_s = 0
     r_len = len(rule)
     s_len = len(seq)
-    while i_s < s_len:
-        if rule[0](seq[i_s]):
-            i_start = i_s + 1
-            i_r = 1
-            while i_start < s_len and i_r < r_len and rule[i_r](seq[i_start]):
-                i_r += 1
-                i_start += 1
-            if i_r == r_len:
-                yield i_s, i_start
-        i_s += 1
-
-
-def _match_regex(txt: str, regexes: Dict[int, regex.Regex]) -> List[RegexMatch]:
+    if starts is None:
+        starts = [i_s for i_s in range(s_len) if rule[0](seq[i_s])]
+    for i_s in starts:
+        i_start = i_s + 1
+        i_r = 1
+        while i_start < s_len and i_r < r_len and rule[i_r](seq[i_start]):
+            i_r += 1
+            i_start += 1
+        if i_r == r_len:
+            yield i_s, i_start
+
+
+def _match_regex(
+    txt: str,
+    regexes: Dict[int, regex.Regex],
+    prefilter: Optional[Dict[int, Requirements]] = None,
+) -> List[RegexMatch]:
     # Match a collection of regexes in *txt*
     #
     # The returned RegexMatch objects are sorted by the start of the match
     # :param txt: the text to match against
     # :param regexes: a collection of regexes name->pattern
+    # :param prefilter: requirements per regex name; regexes whose requirements
+    #   are not met by *txt* are skipped, as they cannot match
     # :return: a list of RegexMatch objects ordered my RegexMatch.mstart
-    matches = {
+    #
+    # NOTE: all patterns are scanned in one pass over the registry and the
+    # matches are collected into a single list. Folding the patterns into one
+    # alternation (or one lookahead per pattern) was evaluated but is not
+    # equivalent: with BESTMATCH and fuzzy constraints an overlapped search
+    # reports the best match after each start position, not every anchored
+    # match, and the combined pattern is several times slower to scan.
+    #
+    # Each pattern yields at most one match per start position, hence matches
+    # are unique per (id, mstart) and no de-duplication is needed. Ties on the
+    # span are broken by the regex id to keep the order deterministic.
+    if prefilter:
+        features = text_features(txt)
+        regexes = {
+            name: re
+            for name, re in regexes.items()
+            if may_match(prefilter.get(name, ()), features)
+        }
+        logger.debug("regex prefilter: {} candidate regexes".format(len(regexes)))
+    matches = [
         RegexMatch(name, m)
         for name, re in regexes.items()
         for m in re.finditer(txt, overlapped=True, concurrent=True)
-    }
+    ]
+    matches.sort(key=lambda x: (x.mstart, x.mend, x.id))
     for m in matches:
         logger.debug("regex: {}".format(m.__repr__()))
-    return sorted(matches, key=lambda x: (x.mstart, x.mend))
+    return matches
 
 
 def _regex_stack(
@@ -367,52 +850,51 @@ def _regex_stack(
 
     prods = []
     n_rm = len(regex_matches)
-    # Calculate the upper triangle of an n_rm x n_rm matrix M where
-    # M[i, j] == 1 (for i<j) iff the expressions i and j are
-    # consecutive (i.e. there is no gap and they can be put together
-    # in one sequence).
-
-    # import numpy as np
-    # M = np.zeros(shape=(n_rm, n_rm), dtype=int)
-
-    # --> avoid use of numpy here; since we need column sums below,
-    # --> the representation of M is columns major, i.e. M[i] is the i-th
-    # --> column; M[i, j] then basically becomes M[j][i]
-    M = [[0 for _ in range(n_rm)] for _ in range(n_rm)]
-
-    _separator_regex = regex.compile(r"\s*", regex.VERSION1)
-
-    def get_m_dist(m1: RegexMatch, m2: RegexMatch) -> int:
-        # 1 if there is no relevant gap between m1 and m2, 0 otherwise
-        # assumes that m1 and m2 are sorted be their start index
-        if m2.mstart < m1.mend:
-            return 0  # Overlap
-        gap_match = _separator_regex.fullmatch(txt[m1.mend : m2.mstart])
-        if gap_match:
-            return 1  # No Gap
-        else:
-            return 0  # Gap
-
-    for i in range(n_rm):
-        for j in range(i + 1, n_rm):
-            M[j][i] = get_m_dist(regex_matches[i], regex_matches[j])
+    succ, n_pred = _regex_successors(txt, regex_matches)
 
     # NOTE(glanaro): I believe this means that this is a beginning node.
     # why reversed?
     stack = [
-        (i,) for i in reversed(range(n_rm)) if sum(M[i]) == 0
+        (i,) for i in reversed(range(n_rm)) if n_pred[i] == 0
     ]  # type: List[Tuple[int, ...]]
     while stack:
         on_do_iter()
         s = stack.pop()
         i = s[-1]
-        new_prod = False
-        for j in range(i + 1, n_rm):
-            if M[j][i] == 1:
-                stack.append(s + (j,))
-                new_prod = True
-        if not new_prod:
+        for j in succ[i]:
+            stack.append(s + (j,))
+        if not succ[i]:
             prod = tuple(regex_matches[i] for i in s)
             logger.debug("regex stack {}".format(prod))
             prods.append(prod)
     return prods
+
+
+def _regex_successors(
+    txt: str, regex_matches: List[RegexMatch]
+) -> Tuple[List[List[int]], List[int]]:
+    # Calculate for each match i the list succ[i] of matches j > i that
+    # are consecutive (i.e. there is no gap and they can be put together
+    # in one sequence), and the number of predecessors n_pred[j] of each
+    # match.
+    #
+    # Since matches are sorted by their start index, the successors of i
+    # are exactly those j > i whose start lies between i's end and the end
+    # of the whitespace run following it -- a contiguous slice of
+    # regex_matches that is located via bisection. This avoids looking at
+    # all n_rm x n_rm pairs of matches.
+    n_rm = len(regex_matches)
+    starts = [m.mstart for m in regex_matches]
+    succ = [[] for _ in range(n_rm)]  # type: List[List[int]]
+    n_pred = [0] * n_rm
+    gap_end = {}  # type: Dict[int, int]
+
+    for i, m in enumerate(regex_matches):
+        if m.mend not in gap_end:
+            gap_end[m.mend] = _separator_regex.match(txt, m.mend).end()
+        lo = max(i + 1, bisect_left(starts, m.mend))
+        hi = bisect_right(starts, gap_end[m.mend])
+        succ[i] = list(range(lo, hi))
+        for j in succ[i]:
+            n_pred[j] += 1
+    return succ, n_pred
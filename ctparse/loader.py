@@ -1,9 +1,7 @@
 """Utility to load default model in ctparse"""
 
-import bz2
 import logging
 import os
-import pickle
 
 from ctparse.scorer import Scorer, DummyScorer
 from ctparse.nb_scorer import NaiveBayesScorer
@@ -13,18 +11,23 @@ logger = logging.getLogger(__name__)
 # Location of the default model, included with ctparse
 DEFAULT_MODEL_FILE = os.path.join(os.path.dirname(__file__), "models", "model.pbz")
 
+# Binary version of the default model, preferred over DEFAULT_MODEL_FILE
+DEFAULT_BINARY_MODEL_FILE = os.path.join(
+    os.path.dirname(__file__), "models", "model.ctpnb"
+)
+
 
 def load_default_scorer() -> Scorer:
     """Load the scorer shipped with ctparse.
 
-    If the scorer is not found, the scorer defaults to `DummyScorer`.
+    The memory mapped binary model is used if present, otherwise the bz2
+    compressed pickle. If the scorer is not found, the scorer defaults to
+    `DummyScorer`.
     """
-    if os.path.exists(DEFAULT_MODEL_FILE):
-        logger.info("Loading model from {}".format(DEFAULT_MODEL_FILE))
-        with bz2.open(DEFAULT_MODEL_FILE, "rb") as fd:
-            mdl = pickle.load(fd)
-        return NaiveBayesScorer(mdl)
-
-    else:
-        logger.warning("No model found, initializing empty scorer")
-        return DummyScorer()
+    for fname in (DEFAULT_BINARY_MODEL_FILE, DEFAULT_MODEL_FILE):
+        if os.path.exists(fname):
+            logger.info("Loading model from {}".format(fname))
+            return NaiveBayesScorer.from_model_file(fname)
+
+    logger.warning("No model found, initializing empty scorer")
+    return DummyScorer()
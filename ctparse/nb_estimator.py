@@ -1,4 +1,4 @@
-from typing import Sequence, Dict, Tuple, List
+from typing import Sequence, Dict, Tuple
 from math import log, exp
 
 
@@ -25,7 +25,7 @@ class MultinomialNaiveBayes:
         """
         self.alpha = alpha
         self.class_prior = (0.0, 0.0)
-        self.log_likelihood: Dict[str, List[float]] = {}
+        self.log_likelihood: Dict[str, Sequence[float]] = {}
 
     @staticmethod
     def _construct_log_class_prior(y: Sequence[int]) -> Tuple[float, float]:
@@ -40,7 +40,7 @@ class MultinomialNaiveBayes:
     @staticmethod
     def _construct_log_likelihood(
         X: Sequence[Dict[int, int]], y: Sequence[int], alpha: float
-    ) -> Dict[str, List[float]]:
+    ) -> Dict[str, Sequence[float]]:
         # Token counts
         # implicit assumption from vectorizer: first element has count for #vocab
         # size set
@@ -121,3 +121,23 @@ class MultinomialNaiveBayes:
             log_prob_x = _log_sum_exp(joint_log_likelihood)
             scores.append((neg_score - log_prob_x, pos_score - log_prob_x))
         return scores
+
+    def log_odds(self) -> Tuple[float, Sequence[float]]:
+        """Return the model as log-odds of the positive class
+
+        Returns
+        -------
+        Tuple[float, Sequence[float]]
+            The log-odds of the class priors and per feature the difference of the
+            positive and negative class log likelihoods. The log-odds of a sample
+            is the former plus the sum of the latter weighted by the feature counts
+        """
+        prior = self.class_prior[1] - self.class_prior[0]
+        weights = [
+            pos - neg
+            for neg, pos in zip(
+                self.log_likelihood["negative_class"],
+                self.log_likelihood["positive_class"],
+            )
+        ]
+        return prior, weights
@@ -0,0 +1,285 @@
+"""Compact binary file format for the naive bayes models used by NaiveBayesScorer.
+
+Unlike the bz2 compressed pickle written by `save_naive_bayes`, a binary model
+file is memory mapped when loaded: nothing is decompressed or unpickled and all
+processes on a host that load the same file share its pages.
+
+Layout (little endian, version 2)::
+
+    header        magic, version, ngram range, number of features n, size of
+                  the feature blob, size of the token blob, alpha and the log
+                  class priors
+    offsets       (n + 1) x uint32, start of each feature in the blob
+    negative      n x float64, log likelihoods of the negative class
+    positive      n x float64, log likelihoods of the positive class
+    codes         n x int64, n-gram code of each feature, see `ngram_codes`
+    weights       n x float64, log-odds weight of each feature
+    blob          utf-8 encoded features, in vocabulary index order
+    tokens        utf-8 encoded tokens of the features, sorted and separated
+                  by spaces
+
+The vocabulary of a `CountVectorizer` assigns indices in sorted order of the
+features, which is also the byte order of their utf-8 encoding. Features are
+hence looked up by binary search in the blob. The codes, weights and tokens
+are what `NaiveBayesScorer` scores rule sequences with, so it does not need to
+read the vocabulary at all.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    cast,
+)
+
+from ctparse.count_vectorizer import CountVectorizer
+from ctparse.nb_estimator import MultinomialNaiveBayes
+from ctparse.pipeline import CTParsePipeline
+
+MAGIC = b"CTPNB\x00"
+VERSION = 2
+
+# magic, version, ngram min, ngram max, n_features, blob size, token blob size,
+# alpha, negative and positive log class prior
+_HEADER = struct.Struct("<6sHIIIIIddd")
+
+# largest n-gram code that fits the int64 codes array
+_MAX_CODE = (1 << 63) - 1
+
+NgramTable = NamedTuple(
+    "NgramTable",
+    [
+        ("tokens", List[str]),
+        ("codes", Sequence[int]),
+        ("weights", Sequence[float]),
+    ],
+)
+
+# maximal number of memoized feature lookups per vocabulary
+_MAX_MEMO = 1 << 16
+
+
+def is_binary_model(fname: str) -> bool:
+    """Check whether *fname* is a binary model file, based on its magic bytes."""
+    with open(fname, "rb") as fd:
+        return fd.read(len(MAGIC)) == MAGIC
+
+
+def ngram_codes(features: Sequence[str]) -> Tuple[List[str], List[int]]:
+    """Encode n-gram *features* (tokens joined by spaces) as integers.
+
+    Each token gets an id > 0, its position in the returned sorted list of
+    tokens plus one. The code of an n-gram is the number with the ids of its
+    tokens as digits in base (number of tokens + 1).
+    """
+    ngrams = [f.split(" ") for f in features]
+    tokens = sorted({t for ngram in ngrams for t in ngram})
+    token_ids = {t: i for i, t in enumerate(tokens, 1)}
+    base = len(tokens) + 1
+    codes = []
+    for ngram in ngrams:
+        code = 0
+        for t in ngram:
+            code = code * base + token_ids[t]
+        codes.append(code)
+    return tokens, codes
+
+
+def save_binary_model(model: CTParsePipeline, fname: str) -> None:
+    """Save a naive bayes model for NaiveBayesScorer in the binary format."""
+    vocabulary = model.transformer.vocabulary
+    if not vocabulary:
+        raise ValueError("model is not fitted")
+    features = [f for f, _ in sorted(vocabulary.items(), key=lambda fi: fi[1])]
+    if features != sorted(features):
+        raise ValueError("vocabulary indices are not in sorted order of features")
+    negative = model.estimator.log_likelihood["negative_class"]
+    positive = model.estimator.log_likelihood["positive_class"]
+    if not len(features) == len(negative) == len(positive):
+        raise ValueError("vocabulary and log likelihoods differ in size")
+
+    tokens, codes = ngram_codes(features)
+    if codes and max(codes) > _MAX_CODE:
+        raise ValueError("too many tokens for the n-gram codes")
+    _, weights = model.estimator.log_odds()
+    token_blob = " ".join(tokens).encode("utf-8")
+
+    encoded = [f.encode("utf-8") for f in features]
+    offsets = array("I", [0])
+    for f in encoded:
+        offsets.append(offsets[-1] + len(f))
+    blob = b"".join(encoded)
+    arrays = [
+        offsets,
+        array("d", negative),
+        array("d", positive),
+        array("q", codes),
+        array("d", weights),
+    ]  # type: List[array[Any]]
+    if sys.byteorder != "little":
+        for a in arrays:
+            a.byteswap()
+
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        model.transformer.ngram_range[0],
+        model.transformer.ngram_range[1],
+        len(features),
+        len(blob),
+        len(token_blob),
+        model.estimator.alpha,
+        model.estimator.class_prior[0],
+        model.estimator.class_prior[1],
+    )
+    with open(fname, "wb") as fd:
+        fd.write(header)
+        fd.write(b"\x00" * _padding(len(header)))
+        for a in arrays:
+            fd.write(a.tobytes())
+            fd.write(b"\x00" * _padding(len(a) * a.itemsize))
+        fd.write(blob)
+        fd.write(token_blob)
+
+
+def load_binary_model(fname: str) -> CTParsePipeline:
+    """Load a naive bayes model from a binary model file.
+
+    The file is memory mapped; the returned pipeline reads the vocabulary and
+    the log likelihoods directly from the mapped pages. The n-gram table of
+    the model is available as the ``ngrams`` attribute of the vocabulary.
+    """
+    with open(fname, "rb") as fd:
+        buf = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(buf) < _HEADER.size or buf[: len(MAGIC)] != MAGIC:
+        raise ValueError("{} is not a binary model file".format(fname))
+    (
+        _,
+        version,
+        ngram_min,
+        ngram_max,
+        n_features,
+        blob_size,
+        token_blob_size,
+        alpha,
+        neg_prior,
+        pos_prior,
+    ) = _HEADER.unpack_from(buf)
+    if version != VERSION:
+        raise ValueError(
+            "unsupported model file version {} in {}".format(version, fname)
+        )
+
+    view = memoryview(buf)
+    pos = _HEADER.size + _padding(_HEADER.size)
+    offsets, pos = _read_array(view, pos, "I", n_features + 1)
+    negative, pos = _read_array(view, pos, "d", n_features)
+    positive, pos = _read_array(view, pos, "d", n_features)
+    codes, pos = _read_array(view, pos, "q", n_features)
+    weights, pos = _read_array(view, pos, "d", n_features)
+    if pos + blob_size + token_blob_size != len(buf):
+        raise ValueError("truncated or corrupt model file {}".format(fname))
+    token_blob = bytes(view[pos + blob_size :]).decode("utf-8")
+    tokens = token_blob.split(" ") if token_blob else []
+
+    transformer = CountVectorizer(ngram_range=(ngram_min, ngram_max))
+    transformer.vocabulary = MappedVocabulary(
+        view[pos : pos + blob_size], offsets, NgramTable(tokens, codes, weights)
+    )
+    estimator = MultinomialNaiveBayes(alpha=alpha)
+    estimator.class_prior = (neg_prior, pos_prior)
+    estimator.log_likelihood = {
+        "negative_class": negative,
+        "positive_class": positive,
+    }
+    return CTParsePipeline(transformer, estimator)
+
+
+class MappedVocabulary(Mapping[str, int]):
+    def __init__(
+        self,
+        blob: memoryview,
+        offsets: Sequence[int],
+        ngrams: Optional[NgramTable] = None,
+    ) -> None:
+        """Read-only vocabulary {feature: index} backed by the sorted feature blob
+        of a binary model file.
+
+        Looked up features are memoized, so repeated lookups cost the same as for
+        a dictionary. *ngrams* is the n-gram table stored with the vocabulary.
+        """
+        self.ngrams = ngrams
+        self._blob = blob
+        self._offsets = offsets
+        self._n_features = len(offsets) - 1
+        self._memo = {}  # type: Dict[str, Optional[int]]
+
+    def _feature(self, idx: int) -> bytes:
+        return bytes(self._blob[self._offsets[idx] : self._offsets[idx + 1]])
+
+    def get(self, feature: str, default: Any = None) -> Any:
+        try:
+            idx = self._memo[feature]
+        except KeyError:
+            if len(self._memo) >= _MAX_MEMO:
+                self._memo.clear()
+            idx = self._memo[feature] = self._search(feature)
+        return default if idx is None else idx
+
+    def _search(self, feature: str) -> Optional[int]:
+        key = feature.encode("utf-8")
+        lo, hi = 0, self._n_features
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._feature(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n_features and self._feature(lo) == key:
+            return lo
+        return None
+
+    def __getitem__(self, feature: str) -> int:
+        idx = self.get(feature)
+        if idx is None:
+            raise KeyError(feature)
+        return cast(int, idx)
+
+    def __contains__(self, feature: object) -> bool:
+        return isinstance(feature, str) and self.get(feature) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for idx in range(self._n_features):
+            yield self._feature(idx).decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._n_features
+
+
+def _padding(size: int) -> int:
+    # number of bytes needed to align the next array to 8 bytes
+    return -size % 8
+
+
+def _read_array(
+    view: memoryview, pos: int, typecode: str, n: int
+) -> Tuple[Sequence[Any], int]:
+    size = n * struct.calcsize(typecode)
+    data = view[pos : pos + size]
+    if sys.byteorder == "little":
+        values = cast(Sequence[Any], data.cast(typecode))
+    else:
+        # mapped pages cannot be used directly, fall back to a private copy
+        copy = array(typecode, data)
+        copy.byteswap()
+        values = copy
+    return values, pos + size + _padding(size)
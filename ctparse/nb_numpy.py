@@ -0,0 +1,120 @@
+"""Vectorized training and batch prediction for the naive bayes pipeline.
+
+This backend requires numpy and scipy, which are installed with the ``numpy``
+extra of ctparse (``pip install ctparse[numpy]``). `CTParsePipeline` uses it
+when both are available. Feature matrices are scipy CSR matrices and the log
+likelihoods a (2, n_features) array, so that scoring a batch of documents is a
+single sparse matrix product.
+
+Fitted models store their log likelihoods as lists, just as the pure python
+implementation, so that they can be loaded without numpy.
+"""
+from itertools import chain
+from typing import List, Mapping, Sequence
+
+import numpy as np
+from scipy import sparse
+
+from ctparse.count_vectorizer import CountVectorizer
+from ctparse.nb_estimator import MultinomialNaiveBayes
+
+
+def feature_matrix(
+    vocabulary: Mapping[str, int], ngram_documents: Sequence[Sequence[str]]
+) -> sparse.csr_matrix:
+    """Count the features of each document in a CSR matrix of shape
+    (n_documents, n_features), see `CountVectorizer._create_feature_matrix`.
+
+    Parameters
+    ----------
+    vocabulary : Mapping[str, int]
+        Vocabulary with {feature: index} mappings
+    ngram_documents : Sequence[Sequence[str]]
+        For each document all its n-gram features, see
+        `CountVectorizer._create_ngrams`
+    """
+    get = vocabulary.get
+    indptr = [0]
+    indices = []  # type: List[int]
+    for document in ngram_documents:
+        indices.extend(idx for idx in map(get, document) if idx is not None)
+        indptr.append(len(indices))
+    X = sparse.csr_matrix(
+        (
+            np.ones(len(indices), dtype=np.float64),
+            np.array(indices, dtype=np.int64),
+            np.array(indptr, dtype=np.int64),
+        ),
+        shape=(len(ngram_documents), len(vocabulary)),
+    )
+    # repeated features are counted by summing their entries
+    X.sum_duplicates()
+    return X
+
+
+def fit_transform(
+    vectorizer: CountVectorizer, documents: Sequence[Sequence[str]]
+) -> sparse.csr_matrix:
+    """Learn the vocabulary of *vectorizer* and return the CSR document-term
+    matrix of *documents*, see `CountVectorizer.fit_transform`.
+    """
+    ngram_documents = CountVectorizer._create_ngrams(vectorizer.ngram_range, documents)
+    all_features = set(chain.from_iterable(ngram_documents))
+    vectorizer.vocabulary = {word: idx for idx, word in enumerate(sorted(all_features))}
+    return feature_matrix(vectorizer.vocabulary, ngram_documents)
+
+
+def transform(
+    vectorizer: CountVectorizer, documents: Sequence[Sequence[str]]
+) -> sparse.csr_matrix:
+    """Return the CSR document-term matrix of *documents* based on the vocabulary
+    of *vectorizer*, see `CountVectorizer.transform`.
+    """
+    if not vectorizer.vocabulary:
+        raise ValueError("no vocabulary - vectorizer not fitted?")
+    ngram_documents = CountVectorizer._create_ngrams(vectorizer.ngram_range, documents)
+    return feature_matrix(vectorizer.vocabulary, ngram_documents)
+
+
+def fit(
+    estimator: MultinomialNaiveBayes, X: sparse.csr_matrix, y: Sequence[int]
+) -> MultinomialNaiveBayes:
+    """Fit *estimator* on the CSR matrix *X* and the labels +1/-1 in *y*, see
+    `MultinomialNaiveBayes.fit`.
+    """
+    positive = np.asarray(y) == 1
+    # per class token counts as matrix-vector products, rows are documents
+    token_counts = (
+        np.vstack(
+            [X.T @ (~positive).astype(np.float64), X.T @ positive.astype(np.float64)]
+        )
+        + estimator.alpha
+    )
+    log_likelihood = np.log(token_counts) - np.log(
+        token_counts.sum(axis=1, keepdims=True)
+    )
+    estimator.class_prior = estimator._construct_log_class_prior(y)
+    estimator.log_likelihood = {
+        "negative_class": log_likelihood[0].tolist(),
+        "positive_class": log_likelihood[1].tolist(),
+    }
+    return estimator
+
+
+def predict_log_probability(
+    estimator: MultinomialNaiveBayes, X: sparse.csr_matrix
+) -> np.ndarray:
+    """Return the (negative-class, positive-class) posterior log probabilities of
+    all rows of the CSR matrix *X* as array of shape (n_documents, 2), see
+    `MultinomialNaiveBayes.predict_log_probability`.
+    """
+    log_likelihood = np.array(
+        [
+            estimator.log_likelihood["negative_class"],
+            estimator.log_likelihood["positive_class"],
+        ],
+        dtype=np.float64,
+    )
+    joint_log_likelihood = X @ log_likelihood.T + np.array(estimator.class_prior)
+    log_prob_x = np.logaddexp(joint_log_likelihood[:, 0], joint_log_likelihood[:, 1])
+    return np.asarray(joint_log_likelihood - log_prob_x[:, None])
@@ -3,10 +3,11 @@ import bz2
 import math
 import pickle
 from datetime import datetime
-from typing import Sequence
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 from ctparse.nb_estimator import MultinomialNaiveBayes
 from ctparse.count_vectorizer import CountVectorizer
+from ctparse.nb_model_file import is_binary_model, load_binary_model, ngram_codes
 from ctparse.pipeline import CTParsePipeline
 from ctparse.scorer import Scorer
 from ctparse.partial_parse import PartialParse
@@ -14,6 +15,11 @@ from ctparse.types import Artifact
 
 
 class NaiveBayesScorer(Scorer):
+    # set if the model is memory mapped from a binary model file
+    _model_file = None  # type: Optional[str]
+    # built on first use, see _ngram_index
+    _index = None  # type: Optional[_NgramIndex]
+
     def __init__(self, nb_model: CTParsePipeline) -> None:
         """Scorer based on a naive bayes estimator.
 
@@ -34,22 +40,46 @@ class NaiveBayesScorer(Scorer):
 
     @classmethod
     def from_model_file(cls, fname: str) -> "NaiveBayesScorer":
+        """Load the scorer from a binary model file or a bz2 compressed pickle.
+
+        Binary model files (see `ctparse.nb_model_file`) are memory mapped and
+        thus shared between all processes that load them.
+        """
+        if is_binary_model(fname):
+            scorer = cls(load_binary_model(fname))
+            scorer._model_file = fname
+            return scorer
         with bz2.open(fname, "rb") as fd:
             return cls(pickle.load(fd))
 
+    def __reduce__(self) -> Union[str, Tuple[Any, ...]]:
+        # memory mapped models cannot be pickled, map the file again instead
+        if self._model_file is not None:
+            return (type(self).from_model_file, (self._model_file,))
+        return super().__reduce__()
+
     def score(self, txt: str, ts: datetime, partial_parse: PartialParse) -> float:
         # Penalty for partial matches
-        max_covered_chars = partial_parse.prod[-1].mend - partial_parse.prod[0].mstart
+        max_covered_chars = partial_parse.last.mend - partial_parse.first.mstart
         len_score = math.log(max_covered_chars / len(txt))
 
-        X = _feature_extractor(txt, ts, partial_parse)
-        pred = self._model.predict_log_proba([X])
-
         # NOTE: the prediction is log-odds, or logit
-        model_score = pred[0][1] - pred[0][0]
+        model_score = self._model_score(partial_parse)
 
         return model_score + len_score
 
+    def score_batch(
+        self, txt: str, ts: datetime, partial_parses: Sequence[PartialParse]
+    ) -> Sequence[float]:
+        if not partial_parses:
+            return []
+        return [
+            # same as in score: log-odds plus penalty for partial matches
+            self._model_score(pp)
+            + math.log((pp.last.mend - pp.first.mstart) / len(txt))
+            for pp in partial_parses
+        ]
+
     def score_final(
         self, txt: str, ts: datetime, partial_parse: PartialParse, prod: Artifact
     ) -> float:
@@ -58,22 +88,142 @@ class NaiveBayesScorer(Scorer):
         # production
         len_score = math.log(len(prod) / len(txt))
 
-        X = _feature_extractor(txt, ts, partial_parse)
-        pred = self._model.predict_log_proba([X])
-
         # NOTE: the prediction is log-odds, or logit
-        model_score = pred[0][1] - pred[0][0]
+        model_score = self._model_score(partial_parse)
 
         # We want the len_score to always take precedence. I believe a logit won't go up
         # more than 1000. A better way would be to return an ordering tuple instead,
         # but then we would need to change many interfaces.
         return model_score + 1000 * len_score
 
-
-def _feature_extractor(
-    txt: str, ts: datetime, partial_parse: PartialParse
-) -> Sequence[str]:
-    return [str(r) for r in partial_parse.rules]
+    def score_final_batch(
+        self,
+        txt: str,
+        ts: datetime,
+        partial_parse: PartialParse,
+        prods: Sequence[Artifact],
+    ) -> Sequence[float]:
+        if not prods:
+            return []
+        # same as in score_final, the model part is shared by all productions
+        model_score = self._model_score(partial_parse)
+        return [model_score + 1000 * math.log(len(prod) / len(txt)) for prod in prods]
+
+    @property
+    def _ngram_index(self) -> "_NgramIndex":
+        if self._index is None:
+            self._index = _NgramIndex(self._model)
+        return self._index
+
+    def _model_score(self, partial_parse: PartialParse) -> float:
+        # Productions of a partial parse inherit its score_state, so only the
+        # n-grams ending in the rules applied since have to be scanned
+        index = self._ngram_index
+        state = partial_parse.score_state
+        if state is not None and state[0] is index:
+            state = index.extend(partial_parse.rules_since(state[1]), state)
+        else:
+            state = index.scan(partial_parse.rules)
+        partial_parse.score_state = state
+        return index.log_odds(state)
+
+
+class _NgramIndex:
+    def __init__(self, model: CTParsePipeline) -> None:
+        """Integer index of the n-gram features of a fitted model.
+
+        Each token in the vocabulary of the model gets an id > 0 and an n-gram
+        of tokens the number with these ids as digits in base (number of tokens
+        + 1). N-grams of a rule sequence are thus mapped to their features by
+        arithmetic instead of by building and counting joined strings. Scores
+        equal those of `CTParsePipeline.predict_log_proba` up to floating point
+        rounding.
+        """
+        vocabulary = model.transformer.vocabulary
+        if not vocabulary:
+            raise ValueError("no vocabulary - vectorizer not fitted?")
+        self.min_n, self.max_n = model.transformer.ngram_range
+        estimator = model.estimator
+        self.prior = estimator.class_prior[1] - estimator.class_prior[0]
+
+        ngrams = getattr(vocabulary, "ngrams", None)
+        if ngrams is not None:
+            # binary model files hold the table, see nb_model_file.ngram_codes
+            tokens, codes, weights = ngrams
+        else:
+            features = sorted(vocabulary, key=vocabulary.__getitem__)
+            tokens, codes = ngram_codes(features)
+            _, weights = estimator.log_odds()
+        self._token_ids = {t: i for i, t in enumerate(tokens, 1)}
+        self._base = len(tokens) + 1
+        # log-odds weight by n-gram code
+        self._weights = dict(zip(codes, weights))  # type: Dict[int, float]
+        # token ids by rule identifier as used in PartialParse.rules
+        self._rule_ids = {}  # type: Dict[Union[int, str], int]
+
+    def _rule_id(self, rule: Union[int, str]) -> int:
+        try:
+            return self._rule_ids[rule]
+        except KeyError:
+            # 0 for rules unknown to the model
+            tid = self._rule_ids[rule] = self._token_ids.get(str(rule), 0)
+            return tid
+
+    def scan(
+        self, rules: Sequence[Union[int, str]], state: Optional["_NgramState"] = None
+    ) -> "_NgramState":
+        """Sum the log-odds weights of all n-grams in *rules*.
+
+        If *state* is the result of scanning a prefix of *rules* with this index,
+        only the n-grams ending in the remaining rules are added to it.
+        """
+        if state is not None and state[0] is self:
+            return self.extend(rules[state[1] :], state)
+        return self.extend(rules)
+
+    def extend(
+        self,
+        new_rules: Sequence[Union[int, str]],
+        state: Optional["_NgramState"] = None,
+    ) -> "_NgramState":
+        """Add the weights of the n-grams ending in *new_rules* to *state*, the
+        result of scanning the rules preceding them with this index (or none).
+        """
+        base = self._base
+        max_n = self.max_n
+        min_n = self.min_n
+        weights = self._weights
+        rule_ids = self._rule_ids
+        if state is not None:
+            _, n_rules, score, codes = state
+        else:
+            n_rules = 0
+            score = self.prior
+            # codes of the n-grams ending at the previous rule, by length n
+            codes = []
+        for rule in new_rules:
+            tid = rule_ids.get(rule)
+            if tid is None:
+                tid = self._rule_id(rule)
+            if tid == 0:
+                # no feature contains an unknown rule
+                codes = []
+                continue
+            codes = [tid] + [c * base + tid for c in codes[: max_n - 1]]
+            for code in codes[min_n - 1 :]:
+                score += weights.get(code, 0.0)
+        return (self, n_rules + len(new_rules), score, codes)
+
+    @staticmethod
+    def log_odds(state: "_NgramState") -> float:
+        """Return the log-odds of a correct parse for a scanned rule sequence."""
+        return state[2]
+
+
+# The result of _NgramIndex.scan: the index, the number of scanned rules, the
+# log-odds and the codes of the n-grams ending at the last scanned rule. Never
+# modified, so states can be shared.
+_NgramState = Tuple[_NgramIndex, int, float, List[int]]
 
 
 def train_naive_bayes(X: Sequence[Sequence[str]], y: Sequence[bool]) -> CTParsePipeline:
@@ -88,7 +238,11 @@ def train_naive_bayes(X: Sequence[Sequence[str]], y: Sequence[bool]) -> CTParseP
 
 
 def save_naive_bayes(model: CTParsePipeline, fname: str) -> None:
-    """Save a naive bayes model for NaiveBayesScorer"""
+    """Save a naive bayes model for NaiveBayesScorer as bz2 compressed pickle
+
+    See `ctparse.nb_model_file.save_binary_model` for the memory mappable
+    binary format.
+    """
     # TODO: version this model and dump metadata with lots of information
     with bz2.open(fname, "wb") as fd:
         pickle.dump(model, fd)
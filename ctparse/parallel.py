@@ -0,0 +1,132 @@
+"""Parse many texts in parallel using a pool of worker processes."""
+import multiprocessing
+from datetime import datetime
+from itertools import islice
+from types import TracebackType
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
+
+from ctparse.ctparse import CTParse, ctparse_batch, preload
+from ctparse.scorer import Scorer
+
+# keyword arguments for ctparse_batch, set once per worker process
+_worker_kwargs = {}  # type: Dict[str, Any]
+
+
+def _init_worker(kwargs: Dict[str, Any]) -> None:
+    # Rules are compiled when ctparse is imported. With the fork start method
+    # workers inherit them and the default scorer preloaded by ParallelParser
+    # from the parent process, otherwise the scorer is loaded here, before the
+    # first chunk arrives. Only the (possibly custom) parameters are
+    # transferred, once per worker.
+    _worker_kwargs.clear()
+    _worker_kwargs.update(kwargs)
+    if kwargs["scorer"] is None:
+        preload()
+
+
+def _parse_chunk(
+    items: List[Tuple[str, Optional[datetime]]]
+) -> List[Optional[CTParse]]:
+    return ctparse_batch(items, **_worker_kwargs)
+
+
+def _chunks(
+    items: Iterable[Tuple[str, Optional[datetime]]], size: int
+) -> Iterator[List[Tuple[str, Optional[datetime]]]]:
+    it = iter(items)
+    chunk = list(islice(it, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(it, size))
+
+
+class ParallelParser:
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        chunksize: int = 32,
+        timeout: Union[int, float] = 1.0,
+        relative_match_len: float = 1.0,
+        max_stack_depth: int = 10,
+        scorer: Optional[Scorer] = None,
+        latent_time: bool = True,
+        beam_width: int = 0,
+        max_expansions: int = 0,
+        chart: bool = False,
+        start_method: Optional[str] = None,
+    ) -> None:
+        """Parse ``(txt, ts)`` pairs in a pool of worker processes.
+
+        Workers are started once and reused for all calls to `parse`. Each
+        worker loads the scorer before it parses its first chunk. Use the
+        parser as a context manager or call `close` to shut down the pool.
+
+        :param processes: number of worker processes, defaults to the number
+                          of CPUs
+        :param chunksize: number of items sent to a worker at once
+        :param scorer: scorer to use, transferred once to each worker; None
+                       uses the default scorer
+        :param start_method: start method of the worker processes (see
+                             multiprocessing), defaults to that of the
+                             platform. With "fork" workers inherit the compiled
+                             rules and the loaded scorer from this process
+                             instead of loading them again, but forking a
+                             process that runs other threads can deadlock.
+
+        All other parameters are as for ctparse. There is no *cache*: each
+        worker would only fill a copy of it, which the caller never sees.
+        """
+        if chunksize < 1:
+            raise ValueError("chunksize must be positive")
+        self.chunksize = chunksize
+        kwargs = {
+            "timeout": timeout,
+            "relative_match_len": relative_match_len,
+            "max_stack_depth": max_stack_depth,
+            "scorer": scorer,
+            "latent_time": latent_time,
+            "beam_width": beam_width,
+            "max_expansions": max_expansions,
+            "chart": chart,
+        }
+        if start_method == "fork" and scorer is None:
+            # load the default scorer once here instead of in every worker
+            preload()
+        context = multiprocessing.get_context(start_method)
+        self._pool = context.Pool(
+            processes, initializer=_init_worker, initargs=(kwargs,)
+        )
+
+    def parse(
+        self, items: Iterable[Tuple[str, Optional[datetime]]]
+    ) -> Iterator[Optional[CTParse]]:
+        """Parse all ``(txt, ts)`` pairs in *items*.
+
+        *items* is consumed lazily and results are streamed back as they
+        become available.
+
+        :returns: Iterator[Optional[CTParse]] with the highest scoring parse (or
+                  None) for each item, in input order
+        """
+        for chunk in self._pool.imap(_parse_chunk, _chunks(items, self.chunksize)):
+            yield from chunk
+
+    def close(self) -> None:
+        """Wait for pending work and shut down the worker processes."""
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self) -> "ParallelParser":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.terminate()
+            self._pool.join()
@@ -1,24 +1,28 @@
+import heapq
 import logging
 from datetime import datetime
 from typing import (
-    Callable,
+    Any,
+    Iterable,
     Optional,
-    Sequence,
     Tuple,
-    TypeVar,
     Union,
     Dict,
     List,
-    Generator,
 )
 
-from ctparse.rule import rules as global_rules, ProductionRule, Predicate
+from ctparse.rule import (
+    applicable_rules,
+    rules as global_rules,
+    ProductionRule,
+    Predicate,
+)
 from ctparse.timers import timeit
 from ctparse.types import Artifact, RegexMatch
 
 logger = logging.getLogger(__name__)
 
-T = TypeVar("T")
+Rules = Dict[str, Tuple[ProductionRule, List[Predicate]]]
 
 
 class PartialParse:
@@ -32,40 +36,70 @@ class PartialParse:
         * rules: the sequence of regular expressions and rules used/applied to produce
                  prod
         * score: the score assigned to this production
+        * score_state: state kept by the scorer to score productions derived from
+                       this partial parse incrementally, inherited by them
+        * artifact_ids: ids of the artifacts in prod and in partial parses
+                        related to it, see prod_key; inherited by derived
+                        partial parses and created on demand if not set
         """
         if len(prod) < 1:
             raise ValueError("prod should have at least one element")
 
-        self.prod = prod
-        self.rules = rules
+        self._prod = prod  # type: Optional[Tuple[Artifact, ...]]
+        self._rules = rules  # type: Optional[Tuple[Union[int, str], ...]]
+        self._n_rules = len(rules)
+        # A partial parse created by apply_rule only stores how it differs
+        # from its parent: the rule applied, the span of the parent's prod it
+        # was applied to and the new artifact. Its prod and rules are built
+        # when first accessed, i.e. only if it is expanded or emitted.
+        self._parent = None  # type: Optional[PartialParse]
+        self._rule_name = None  # type: Union[int, str, None]
+        self._match = (0, 0)
+        self._new = prod[0]
+        # the first and last artifact of prod
+        self._first = prod[0]
+        self._last = prod[-1]
         self.applicable_rules = global_rules
-        self.max_covered_chars = self.prod[-1].mend - self.prod[0].mstart
+        self.max_covered_chars = self._last.mend - self._first.mstart
         self.score = 0.0
+        self.score_state = None  # type: Any
+        self.artifact_ids = None  # type: Optional[Dict[Artifact, int]]
+        self._prod_key = None  # type: Optional[Tuple[int, ...]]
 
     @classmethod
     def from_regex_matches(
-        cls, regex_matches: Tuple[RegexMatch, ...]
+        cls,
+        regex_matches: Tuple[RegexMatch, ...],
+        rule_cache: Optional[Dict[Tuple[int, ...], Rules]] = None,
     ) -> "PartialParse":
         """Create partial production from a series of RegexMatch
 
         This usually is called when no production rules (with the exception of
         regex matches) have been applied.
 
+        :param rule_cache: optional dictionary to look up and store the applicable
+          rules, which only depend on the sequence of regex ids in regex_matches
         """
-        se = cls(prod=regex_matches, rules=tuple(r.id for r in regex_matches))
+        regex_ids = tuple(r.id for r in regex_matches)
+        se = cls(prod=regex_matches, rules=regex_ids)
 
         logger.debug("=" * 80)
         logger.debug("-> checking rule applicability")
         # Reducing rules to only those applicable has no effect for
         # small stacks, but on larger there is a 10-20% speed
         # improvement
-        se.applicable_rules, _ts = timeit(se._filter_rules)(global_rules)
+        if rule_cache is not None and regex_ids in rule_cache:
+            se.applicable_rules, _ts = rule_cache[regex_ids], 0.0
+        else:
+            se.applicable_rules, _ts = timeit(applicable_rules)(regex_ids)
+            if rule_cache is not None:
+                rule_cache[regex_ids] = se.applicable_rules
         logger.debug(
             "of {} total rules {} are applicable in {}".format(
                 len(global_rules), len(se.applicable_rules), se.prod
             )
         )
-        logger.debug("time in _filter_rules: {:.0f}ms".format(1000 * _ts))
+        logger.debug("time in applicable_rules: {:.0f}ms".format(1000 * _ts))
         logger.debug("=" * 80)
 
         return se
@@ -89,19 +123,100 @@ class PartialParse:
         :param rule_name: the name of the rule
         :param match: the start and end index of the parameters that the rule needs.
         """
-        prod = rule(ts, *self.prod[match[0] : match[1]])
+        parent_prod = self.prod
+        prod = rule(ts, *parent_prod[match[0] : match[1]])
 
         if prod is not None:
-            pp = PartialParse(
-                prod=self.prod[: match[0]] + (prod,) + self.prod[match[1] :],
-                rules=self.rules + (rule_name,),
-            )
-
+            pp = PartialParse.__new__(PartialParse)
+            pp._prod = None
+            pp._rules = None
+            pp._n_rules = self._n_rules + 1
+            pp._parent = self
+            pp._rule_name = rule_name
+            pp._match = match
+            pp._new = prod
+            pp._first = prod if match[0] == 0 else self._first
+            pp._last = prod if match[1] == len(parent_prod) else self._last
+            pp.max_covered_chars = pp._last.mend - pp._first.mstart
+            pp.score = 0.0
             pp.applicable_rules = self.applicable_rules
+            pp.score_state = self.score_state
+            # derive the key from that of this partial parse
+            key = self.prod_key
+            ids = pp.artifact_ids = self.artifact_ids
+            assert ids is not None
+            pp._prod_key = (
+                key[: match[0]] + (ids.setdefault(prod, len(ids)),) + key[match[1] :]
+            )
             return pp
         else:
             return None
 
+    @property
+    def prod(self) -> Tuple[Artifact, ...]:
+        """The current partial production."""
+        if self._prod is None:
+            assert self._parent is not None
+            parent_prod = self._parent.prod
+            self._prod = (
+                parent_prod[: self._match[0]]
+                + (self._new,)
+                + parent_prod[self._match[1] :]
+            )
+        return self._prod
+
+    @property
+    def rules(self) -> Tuple[Union[int, str], ...]:
+        """The regular expressions and rules used/applied to produce prod."""
+        if self._rules is None:
+            # collect the rules applied since the closest ancestor whose rules
+            # have been built
+            names = []  # type: List[Union[int, str]]
+            pp = self
+            while pp._rules is None:
+                assert pp._parent is not None and pp._rule_name is not None
+                names.append(pp._rule_name)
+                pp = pp._parent
+            self._rules = pp._rules + tuple(reversed(names))
+        return self._rules
+
+    def rules_since(self, start: int) -> List[Union[int, str]]:
+        """Return rules[start:], without building rules."""
+        names = []  # type: List[Union[int, str]]
+        pp = self
+        n = self._n_rules
+        while pp._rules is None and n > start:
+            assert pp._parent is not None and pp._rule_name is not None
+            names.append(pp._rule_name)
+            pp = pp._parent
+            n -= 1
+        head = list(pp._rules[start:n]) if pp._rules is not None else []
+        return head + names[::-1]
+
+    @property
+    def first(self) -> Artifact:
+        """prod[0], without building prod."""
+        return self._first
+
+    @property
+    def last(self) -> Artifact:
+        """prod[-1], without building prod."""
+        return self._last
+
+    @property
+    def prod_key(self) -> Tuple[int, ...]:
+        """A compact key for prod: the ids of its artifacts in artifact_ids.
+
+        Artifacts get the same id iff they are equal, so for partial parses
+        sharing their artifact ids the keys are equal iff their productions are.
+        """
+        if self._prod_key is None:
+            if self.artifact_ids is None:
+                self.artifact_ids = {}
+            ids = self.artifact_ids
+            self._prod_key = tuple(ids.setdefault(a, len(ids)) for a in self.prod)
+        return self._prod_key
+
     def __lt__(self, other: "PartialParse") -> bool:
         """Sort stack elements by (a) the length of text they can
         (potentially) cover and (b) the score assigned to the
@@ -120,88 +235,142 @@ class PartialParse:
             repr(self.prod), repr(self.rules), repr(self.score)
         )
 
-    def _filter_rules(
-        self, rules: Dict[str, Tuple[ProductionRule, List[Predicate]]]
-    ) -> Dict[str, Tuple[ProductionRule, List[Predicate]]]:
-        # find all rules that can be applied to the current prod sequence
-        def _hasNext(it: Generator[List[int], None, None]) -> bool:
-            try:
-                next(it)
-                return True
-            except StopIteration:
+
+class Frontier:
+    def __init__(self, max_size: int = 0) -> None:
+        """The stack of partial parses to expand in the best-first search.
+
+        Equivalent to a list of partial parses that is sorted (stable, see
+        PartialParse.__lt__) after partial parses are added, truncated to the
+        last *max_size* elements (0 for no limit) and popped from the end:
+        `pop` returns the partial parse with the largest
+        (max_covered_chars, score) and on ties the one added last. If there are
+        more than *max_size* partial parses, the smallest ones are evicted,
+        added first on ties.
+
+        Adding, popping and evicting a partial parse take O(log n) time.
+        """
+        self.max_size = max_size
+        self._seq = 0
+        # partial parses in the frontier by the sequence number they were
+        # added with; heap entries of partial parses not in here are stale
+        self._live = {}  # type: Dict[int, PartialParse]
+        # (-max_covered_chars, -score, -seq, pp) to pop the largest
+        self._max_heap = []  # type: List[Tuple[int, float, int, PartialParse]]
+        # (max_covered_chars, score, seq) to evict the smallest
+        self._min_heap = []  # type: List[Tuple[int, float, int]]
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def push(self, pp: "PartialParse") -> bool:
+        """Add *pp*, return False if it was evicted right away.
+
+        A partial parse smaller than all others in a full frontier would be
+        evicted right away, so it is not added to the heaps in the first place.
+        """
+        if self.max_size > 0 and len(self._live) >= self.max_size:
+            if (pp.max_covered_chars, pp.score) < self._min_key():
                 return False
+        seq = self._seq
+        self._seq += 1
+        self._live[seq] = pp
+        heapq.heappush(self._max_heap, (-pp.max_covered_chars, -pp.score, -seq, pp))
+        if self.max_size > 0:
+            heapq.heappush(self._min_heap, (pp.max_covered_chars, pp.score, seq))
+            if len(self._live) > self.max_size:
+                self._evict()
+        return True
 
-        return {
-            rule_name: r
-            for rule_name, r in rules.items()
-            if _hasNext(_seq_match(self.prod, r[1]))
-        }
-
-
-def _seq_match(
-    seq: Sequence[T], pat: Sequence[Callable[[T], bool]], offset: int = 0
-) -> Generator[List[int], None, None]:
-    # :param seq: a list of intermediate productions, either of type
-    # RegexMatch or some other Artifact
-    #
-    # :param pat: a list of rule patterns to be matched, i.e. either a
-    # RegexMatch or a callable
-    #
-    # Determine whether the pattern pat matches the sequence seq and
-    # return a list of lists, where each sub-list contains those
-    # indices where the RegexMatch objects in pat are located in seq.
-    #
-    # A pattern pat only matches seq, iff each RegexMatch in pat is in
-    # seq in the same order and iff between two RegexMatches aligned
-    # to seq there is at least one additional element in seq. Reason:
-    #
-    # * Rule patterns never have two consequitive RegexMatch objects.
-    #
-    # * Hence there must be some predicate/dimension between two
-    # * RegexMatch objects.
-    #
-    # * For the whole pat to match there must then be at least one
-    #  element in seq that can product this intermediate bit
-    #
-    # If pat does not start with a RegexMatch then there must be at
-    # least one element in seq before the first RegexMatch in pat that
-    # is alignes on seq. Likewise, if pat does not end with a
-    # RegexMatch, then there must be at least one additional element
-    # in seq to match the last non-RegexMatch element in pat.
-    #
-    # STRONG ASSUMPTIONS ON ARGUMENTS: seq and pat do not contain
-    # consequiteve elements which are both of type RegexMatch! Callers
-    # obligation to ensure this!
-
-    if not pat:
-        # if pat is empty yield the empty match
-        yield []
-    elif not seq or not pat:
-        # if either seq or pat is empty there will be no match
-        return
-    elif pat[-1].__name__ != "_regex_match":
-        # there must be at least one additional element in seq at the
-        # end
-        yield from _seq_match(seq[:-1], pat[:-1], offset)
-    elif len(pat) > len(seq):
-        # if pat is longer than seq it cannot match
-        return
-    else:
-        p1 = pat[0]
-        # if p1 is not a RegexMatch, then continue on next pat and
-        # advance sequence by one
-        if p1.__name__ != "_regex_match":
-            yield from _seq_match(seq[1:], pat[1:], offset + 1)
-        else:
-            # Get number of RegexMatch in p
-            n_regex = sum(1 for p in pat if p.__name__ == "_regex_match")
-            # For each occurance of RegexMatch pat[0] in seq
-            for iseq, s in enumerate(seq):
-                # apply _regex_match check
-                if p1(s):
-                    # for each match of pat[1:] in seq[iseq+1:], yield a result
-                    for subm in _seq_match(seq[iseq + 1 :], pat[1:], offset + iseq + 1):
-                        if len(subm) == n_regex - 1:
-                            # only yield if all subsequent RegexMatch
-                            # have been aligned!
-                            yield [iseq + offset] + subm
+    def extend(self, pps: Iterable["PartialParse"]) -> None:
+        for pp in pps:
+            self.push(pp)
+
+    def pop(self) -> "PartialParse":
+        while True:
+            # raises IndexError on an empty frontier, as list.pop
+            _, _, neg_seq, pp = heapq.heappop(self._max_heap)
+            if self._remove(-neg_seq) is not None:
+                self._compact()
+                return pp
+
+    def _min_key(self) -> Tuple[int, float]:
+        # (max_covered_chars, score) of the partial parse evicted next
+        while self._min_heap[0][2] not in self._live:
+            heapq.heappop(self._min_heap)
+        return self._min_heap[0][:2]
+
+    def _evict(self) -> None:
+        while True:
+            _, _, seq = heapq.heappop(self._min_heap)
+            if self._remove(seq) is not None:
+                self._compact()
+                return
+
+    def _remove(self, seq: int) -> Optional["PartialParse"]:
+        # remove the partial parse added with seq, None if it is not live
+        return self._live.pop(seq, None)
+
+    def _compact(self) -> None:
+        # drop stale heap entries once they make up most of a heap
+        n = 2 * len(self._live) + 16
+        if len(self._max_heap) > n:
+            self._max_heap = [e for e in self._max_heap if -e[2] in self._live]
+            heapq.heapify(self._max_heap)
+        if len(self._min_heap) > n:
+            self._min_heap = [e for e in self._min_heap if e[2] in self._live]
+            heapq.heapify(self._min_heap)
+
+
+class BeamFrontier(Frontier):
+    def __init__(self, beam_width: int) -> None:
+        """A `Frontier` for beam search: instead of the total number of partial
+        parses, the number of partial parses per covered span of text is
+        limited to *beam_width*.
+
+        The span of a partial parse reaches from the start of its first to the
+        end of its last artifact when it is added. Partial parses with the
+        same span compete for the same beam, the one with the smallest score
+        (added first on ties) is evicted from a full beam. `pop` is as for
+        `Frontier`.
+        """
+        if beam_width < 1:
+            raise ValueError("beam_width must be positive")
+        super().__init__()
+        self.beam_width = beam_width
+        # (score, seq) per span to evict the smallest, the number of live
+        # partial parses per span and the span of each live partial parse
+        self._beams = {}  # type: Dict[Tuple[int, int], List[Tuple[float, int]]]
+        self._beam_len = {}  # type: Dict[Tuple[int, int], int]
+        self._spans = {}  # type: Dict[int, Tuple[int, int]]
+
+    def push(self, pp: "PartialParse") -> bool:
+        span = (pp.first.mstart, pp.last.mend)
+        beam = self._beams.setdefault(span, [])
+        n = self._beam_len.get(span, 0)
+        if n >= self.beam_width:
+            while beam[0][1] not in self._live:
+                heapq.heappop(beam)
+            if pp.score < beam[0][0]:
+                return False
+        seq = self._seq
+        self._seq += 1
+        self._live[seq] = pp
+        self._spans[seq] = span
+        self._beam_len[span] = n + 1
+        heapq.heappush(self._max_heap, (-pp.max_covered_chars, -pp.score, -seq, pp))
+        heapq.heappush(beam, (pp.score, seq))
+        if n >= self.beam_width:
+            while self._remove(heapq.heappop(beam)[1]) is None:
+                pass
+        if len(beam) > 2 * self.beam_width + 16:
+            self._beams[span] = [e for e in beam if e[1] in self._live]
+            heapq.heapify(self._beams[span])
+        self._compact()
+        return True
+
+    def _remove(self, seq: int) -> Optional["PartialParse"]:
+        pp = self._live.pop(seq, None)
+        if pp is not None:
+            self._beam_len[self._spans.pop(seq)] -= 1
+        return pp
@@ -1,11 +1,27 @@
-from typing import Sequence, Tuple
+from typing import Optional, Sequence, Tuple
 
 from ctparse.nb_estimator import MultinomialNaiveBayes
 from ctparse.count_vectorizer import CountVectorizer
 
+try:
+    import numpy  # noqa: F401
+    import scipy.sparse  # noqa: F401
+
+    HAS_NUMPY = True
+except ImportError:  # pragma: no cover
+    HAS_NUMPY = False
+
 
 class CTParsePipeline:
-    def __init__(self, transformer: CountVectorizer, estimator: MultinomialNaiveBayes):
+    # default for pipelines pickled before the numpy backend was added
+    use_numpy = None  # type: Optional[bool]
+
+    def __init__(
+        self,
+        transformer: CountVectorizer,
+        estimator: MultinomialNaiveBayes,
+        use_numpy: Optional[bool] = None,
+    ):
         """Setup a pipeline of feature extraction and naive bayes. Overkill for what it
         does but leaves room to use different models/features in the future
 
@@ -15,9 +31,17 @@ class CTParsePipeline:
             feature extraction step
         estimator : MultinomialNaiveBayes
             naive bayes model
+        use_numpy : Optional[bool]
+            whether to fit and predict with the vectorized backend in
+            `ctparse.nb_numpy`, which requires numpy and scipy. Defaults to None,
+            which uses it if both are installed
         """
         self.transformer = transformer
         self.estimator = estimator
+        self.use_numpy = use_numpy
+
+    def _use_numpy(self) -> bool:
+        return HAS_NUMPY if self.use_numpy is None else self.use_numpy
 
     def fit(self, X: Sequence[Sequence[str]], y: Sequence[int]) -> "CTParsePipeline":
         """Fit the transformer and then fit the Naive Bayes model on the transformed
@@ -28,6 +52,12 @@ class CTParsePipeline:
         CTParsePipeline
             Returns the fitted pipeline
         """
+        if self._use_numpy():
+            from ctparse import nb_numpy
+
+            X_sparse = nb_numpy.fit_transform(self.transformer, X)
+            self.estimator = nb_numpy.fit(self.estimator, X_sparse, y)
+            return self
         X_transformed = self.transformer.fit_transform(X)
         self.estimator = self.estimator.fit(X_transformed, y)
         return self
@@ -49,5 +79,15 @@ class CTParsePipeline:
             For each document the tuple of negative/positive log probability from the
             naive bayes model
         """
+        if self._use_numpy():
+            from ctparse import nb_numpy
+
+            X_sparse = nb_numpy.transform(self.transformer, X)
+            return [
+                (neg, pos)
+                for neg, pos in nb_numpy.predict_log_probability(
+                    self.estimator, X_sparse
+                ).tolist()
+            ]
         X_transformed = self.transformer.transform(X)
         return self.estimator.predict_log_probability(X_transformed)
@@ -0,0 +1,420 @@
+"""Cheap prefilter to skip regular expressions that cannot match a text.
+
+When a rule registers a regular expression, the pattern is analyzed once and
+reduced to a conjunction of clauses. Each clause is a set of literal strings
+(and optionally "any decimal digit") at least one of which must occur in every
+text the pattern can match. Before running the (fuzzy) regular expressions on
+a text, the clauses are checked against the case folded text, which is a few
+substring tests instead of a full regex scan.
+
+The analysis is conservative: whenever a construct is not understood, no
+clause is derived from it and the pattern is always run.
+
+Although this module is not part of the public API, it is used by the rule
+registry and by the regex matching in ctparse.
+"""
+import logging
+from itertools import product
+from typing import FrozenSet, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+import regex
+
+logger = logging.getLogger(__name__)
+
+# A clause is satisfied by a text iff any of the literals is contained in the
+# case folded text, or if `digit` is set and the text contains a decimal digit.
+Clause = NamedTuple("Clause", [("literals", FrozenSet[str]), ("digit", bool)])
+
+# All clauses must be satisfied for a pattern to possibly match
+Requirements = Tuple[Clause, ...]
+
+# maximal number of alternative strings tracked for a literal run
+_MAX_ALTERNATIVES = 32
+# maximal size of a character class that is expanded into alternatives
+_MAX_CLASS_SIZE = 4
+
+_digit_regex = regex.compile(r"\d", regex.VERSION1)
+_repetition_regex = regex.compile(r"(\d*)(?:,(\d*))?")
+_fuzzy_regex = regex.compile(r"(?:[eisd]<=?\d+,?)+")
+_fuzzy_cost_regex = regex.compile(r"[eisd]<=?(\d+)")
+
+
+# escapes followed by a code point, a character name or a group number (octal
+# escapes and back references)
+_CODE_ESCAPES = frozenset("xuUN0123456789")
+
+
+class _Unsupported(Exception):
+    pass
+
+
+# Nodes of the pattern syntax tree. Only those properties relevant to derive
+# requirements are kept.
+class _Node:
+    # the finite set of strings the node matches, or None if unknown/too many
+    strings = None  # type: Optional[FrozenSet[str]]
+    # a digit is required (the node matches exactly one decimal digit)
+    digit = False
+
+    def requirements(self) -> List[Clause]:
+        if self.strings is not None:
+            return _clause(self.strings, False)
+        if self.digit:
+            return [Clause(frozenset(), True)]
+        return []
+
+
+class _Chars(_Node):
+    def __init__(self, chars: Optional[FrozenSet[str]], digit: bool = False):
+        # chars=None means any (or at least an unknown) character
+        self.strings = chars
+        self.digit = digit
+
+
+class _Empty(_Node):
+    # zero width assertions, lookarounds, empty groups
+    strings = frozenset([""])
+
+
+class _Seq(_Node):
+    def __init__(self, items: List[_Node]) -> None:
+        self.items = items
+        self.strings = _product([i.strings for i in items])
+
+    def requirements(self) -> List[Clause]:
+        if self.strings is not None:
+            return _clause(self.strings, False)
+        # merge adjacent items with known strings into literal runs
+        clauses = []  # type: List[Clause]
+        run = frozenset([""])  # type: FrozenSet[str]
+        for item in self.items:
+            if item.strings is not None:
+                merged = _product([run, item.strings])
+                if merged is None:
+                    clauses.extend(_clause(run, False))
+                    merged = item.strings
+                run = merged
+            else:
+                clauses.extend(_clause(run, False))
+                run = frozenset([""])
+                clauses.extend(item.requirements())
+        clauses.extend(_clause(run, False))
+        return clauses
+
+
+class _Alt(_Node):
+    def __init__(self, branches: List[_Node]) -> None:
+        self.branches = branches
+        strings = set()  # type: Set[str]
+        for b in branches:
+            if b.strings is None:
+                break
+            strings.update(b.strings)
+        else:
+            if len(strings) <= _MAX_ALTERNATIVES:
+                self.strings = frozenset(strings)
+
+    def requirements(self) -> List[Clause]:
+        if self.strings is not None:
+            return _clause(self.strings, False)
+        # any branch can match: pick the most selective clause of each branch
+        # and require any of them
+        literals = set()  # type: Set[str]
+        digit = False
+        for b in self.branches:
+            clauses = b.requirements()
+            if not clauses:
+                return []
+            best = max(clauses, key=_selectivity)
+            literals.update(best.literals)
+            digit |= best.digit
+        return _clause(frozenset(literals), digit)
+
+
+class _Repeat(_Node):
+    def __init__(self, item: _Node, min_count: int, max_count: Optional[int]):
+        self.item = item
+        self.min_count = min_count
+        if item.strings is not None and max_count == 1:
+            if min_count == 0:
+                self.strings = item.strings | frozenset([""])
+            else:
+                self.strings = item.strings
+
+    def requirements(self) -> List[Clause]:
+        if self.strings is not None:
+            return _clause(self.strings, False)
+        if self.min_count == 0:
+            return []
+        return self.item.requirements()
+
+
+class _Fuzzy(_Node):
+    def __init__(self, item: _Node, max_errors: int) -> None:
+        self.item = item
+        self.max_errors = max_errors
+
+    def requirements(self) -> List[Clause]:
+        # With at most k errors, at least one of k + 1 disjoint pieces of each
+        # required literal survives unchanged. Digits can be substituted.
+        clauses = []
+        for c in self.item.requirements():
+            if c.digit:
+                continue
+            pieces = set()  # type: Set[str]
+            for lit in c.literals:
+                n = self.max_errors + 1
+                if len(lit) < n:
+                    break
+                bounds = [i * len(lit) // n for i in range(n + 1)]
+                pieces.update(lit[a:b] for a, b in zip(bounds[:-1], bounds[1:]))
+            else:
+                clauses.extend(_clause(frozenset(pieces), False))
+        return clauses
+
+
+def _product(parts: List[Optional[FrozenSet[str]]]) -> Optional[FrozenSet[str]]:
+    res = frozenset([""])  # type: FrozenSet[str]
+    for p in parts:
+        if p is None or len(res) * len(p) > _MAX_ALTERNATIVES:
+            return None
+        res = frozenset(a + b for a, b in product(res, p))
+    return res
+
+
+def _clause(literals: FrozenSet[str], digit: bool) -> List[Clause]:
+    # Build a (list of at most one) clause. A literal that contains another
+    # literal of the same clause is redundant. An empty literal is always
+    # contained in the text, hence the clause is trivially satisfied.
+    if "" in literals:
+        return []
+    if not literals and not digit:
+        return []
+    minimal = frozenset(
+        lit for lit in literals if not any(o != lit and o in lit for o in literals)
+    )
+    return [Clause(minimal, digit)]
+
+
+def _selectivity(c: Clause) -> int:
+    # prefer clauses whose shortest literal is long
+    lengths = [len(lit) for lit in c.literals]
+    if c.digit:
+        lengths.append(1)
+    return min(lengths)
+
+
+class _Parser:
+    def __init__(self, pattern: str, defines: Mapping[str, str], depth: int = 0):
+        self.pattern = pattern
+        self.pos = 0
+        self.defines = defines
+        self.depth = depth
+
+    def parse(self) -> _Node:
+        node = self._alternation()
+        if self.pos != len(self.pattern):
+            raise _Unsupported("unbalanced parenthesis")
+        return node
+
+    def _peek(self) -> str:
+        return self.pattern[self.pos] if self.pos < len(self.pattern) else ""
+
+    def _alternation(self) -> _Node:
+        branches = [self._sequence()]
+        while self._peek() == "|":
+            self.pos += 1
+            branches.append(self._sequence())
+        return branches[0] if len(branches) == 1 else _Alt(branches)
+
+    def _sequence(self) -> _Node:
+        items = []
+        while self._peek() not in ("", "|", ")"):
+            items.append(self._quantified(self._atom()))
+        return _Seq(items)
+
+    def _quantified(self, node: _Node) -> _Node:
+        while True:
+            c = self._peek()
+            if c in ("?", "*", "+"):
+                self.pos += 1
+                node = _Repeat(node, 1 if c == "+" else 0, 1 if c == "?" else None)
+            elif c == "{":
+                end = self.pattern.find("}", self.pos)
+                if end < 0:
+                    raise _Unsupported("unterminated brace")
+                body = self.pattern[self.pos + 1 : end]
+                self.pos = end + 1
+                rep = _repetition_regex.fullmatch(body)
+                if rep and (rep.group(1) or rep.group(2)):
+                    lo = int(rep.group(1) or 0)
+                    if rep.group(2) is None and "," not in body:
+                        hi = lo  # type: Optional[int]
+                    else:
+                        hi = int(rep.group(2)) if rep.group(2) else None
+                    node = _Repeat(node, lo, hi)
+                elif _fuzzy_regex.fullmatch(body):
+                    costs = _fuzzy_cost_regex.findall(body)
+                    node = _Fuzzy(node, sum(int(c) for c in costs))
+                else:
+                    raise _Unsupported("unknown brace {{{}}}".format(body))
+            else:
+                return node
+            # lazy and possessive modifiers do not change what can match
+            if self._peek() in ("?", "+"):
+                self.pos += 1
+
+    def _atom(self) -> _Node:
+        c = self._peek()
+        self.pos += 1
+        if c == "(":
+            return self._group()
+        if c == "[":
+            return self._char_class()
+        if c == "\\":
+            return self._escape()
+        if c == ".":
+            return _Chars(None)
+        if c in ("^", "$"):
+            return _Empty()
+        return _Chars(frozenset([c.casefold()]))
+
+    def _group(self) -> _Node:
+        if self.pattern.startswith("?", self.pos):
+            rest = self.pattern[self.pos :]
+            if rest.startswith(("?:", "?>")):
+                self.pos += 2
+            elif rest.startswith(("?=", "?!", "?<=", "?<!")):
+                self.pos += 3 if rest.startswith("?<") else 2
+                self._alternation()
+                self._expect(")")
+                return _Empty()
+            elif rest.startswith(("?P<", "?<")):
+                end = self.pattern.find(">", self.pos)
+                if end < 0:
+                    raise _Unsupported("unterminated group name")
+                self.pos = end + 1
+            elif rest.startswith("?&"):
+                end = self.pattern.find(")", self.pos)
+                name = self.pattern[self.pos + 2 : end]
+                self.pos = end + 1
+                if name not in self.defines or self.depth > 10:
+                    raise _Unsupported("unknown group {}".format(name))
+                return _Parser(self.defines[name], self.defines, self.depth + 1).parse()
+            else:
+                raise _Unsupported("unknown group {}".format(rest[:3]))
+        node = self._alternation()
+        self._expect(")")
+        return node
+
+    def _expect(self, c: str) -> None:
+        if self._peek() != c:
+            raise _Unsupported("expected {}".format(c))
+        self.pos += 1
+
+    def _escape(self) -> _Node:
+        c = self._peek()
+        self.pos += 1
+        if c == "":
+            raise _Unsupported("trailing backslash")
+        if c == "d":
+            return _Chars(None, digit=True)
+        if c in ("b", "B", "A", "Z", "G"):
+            return _Empty()
+        if c in _CODE_ESCAPES:
+            raise _Unsupported("escape \\{}".format(c))
+        if c.isalnum():
+            # \s, \w, \D, \n, \p{..}, \pL etc.: some unknown character
+            if c in ("p", "P"):
+                if self._peek() == "{":
+                    self.pos = self.pattern.index("}", self.pos) + 1
+                else:
+                    self.pos += 1
+            return _Chars(None)
+        return _Chars(frozenset([c.casefold()]))
+
+    def _char_class(self) -> _Node:
+        chars = set()  # type: Set[str]
+        negated = self._peek() == "^"
+        if negated:
+            self.pos += 1
+        simple = not negated
+        first = True
+        while True:
+            c = self._peek()
+            if c == "":
+                raise _Unsupported("unterminated character class")
+            self.pos += 1
+            if c == "]" and not first:
+                break
+            first = False
+            if c == "\\":
+                c = self._peek()
+                self.pos += 1
+                if c in _CODE_ESCAPES:
+                    raise _Unsupported("escape \\{}".format(c))
+                if c.isalnum():
+                    simple = False
+                    continue
+            elif c == "[":
+                raise _Unsupported("nested character class")
+            if self._peek() == "-" and self.pattern[
+                self.pos + 1 : self.pos + 2
+            ] not in (
+                "]",
+                "",
+            ):
+                hi = self.pattern[self.pos + 1]
+                self.pos += 2
+                if hi == "\\":
+                    raise _Unsupported("escaped range bound")
+                chars.update(chr(o) for o in range(ord(c), ord(hi) + 1))
+            else:
+                chars.add(c)
+        if simple and chars and all(c in "0123456789" for c in chars):
+            return _Chars(None, digit=True)
+        if simple and chars and len(chars) <= _MAX_CLASS_SIZE:
+            return _Chars(frozenset(c.casefold() for c in chars))
+        return _Chars(None)
+
+
+def requirements(
+    pattern: str, defines: Optional[Mapping[str, str]] = None
+) -> Requirements:
+    """Derive the requirements a text must fulfill to be matched by `pattern`.
+
+    The pattern is assumed to be matched case insensitive.
+
+    :param pattern: the regular expression (in the syntax of the `regex` module)
+    :param defines: mapping of group names to expressions referenced via `(?&name)`
+    :returns: a tuple of clauses, all of which must be satisfied for a match; an
+      empty tuple if nothing could be derived
+    """
+    try:
+        node = _Parser(pattern, defines or {}).parse()
+    except (_Unsupported, IndexError, ValueError) as e:
+        logger.debug("no prefilter for {}: {}".format(pattern, e))
+        return ()
+    # de-duplicate while keeping the order stable
+    return tuple(dict.fromkeys(node.requirements()))
+
+
+TextFeatures = NamedTuple("TextFeatures", [("folded", str), ("has_digit", bool)])
+
+
+def text_features(txt: str) -> TextFeatures:
+    """Compute the features of `txt` that requirements are checked against."""
+    return TextFeatures(txt.casefold(), _digit_regex.search(txt) is not None)
+
+
+def may_match(reqs: Requirements, features: TextFeatures) -> bool:
+    """Return False only if a pattern with requirements `reqs` cannot match the
+    text with the given `features`."""
+    folded = features.folded
+    for clause in reqs:
+        if not (
+            (clause.digit and features.has_digit)
+            or any(lit in folded for lit in clause.literals)
+        ):
+            return False
+    return True
@@ -1,18 +1,36 @@
 # flake8: noqa F405
+import dis
 import logging
 
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union, Type
+from functools import wraps
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    Type,
+)
 
 import regex
 
+from ctparse.prefilter import Requirements, requirements
 from ctparse.types import Artifact, RegexMatch
 
 logger = logging.getLogger(__name__)
 
 
 # A predicate is a callable that returns True if the predicate
-# applies to the artifact
+# applies to the artifact. The results of the predicates created by regex_match,
+# dimension and predicate only depend on the shape of the artifact (see
+# Artifact.shape) and are memoized per shape, other predicates are evaluated
+# for each artifact.
 Predicate = Callable[[Artifact], bool]
 
 # ProductionRule is a function used to generate an artifact given other
@@ -21,11 +39,38 @@ ProductionRule = Callable[..., Optional[Artifact]]
 
 
 rules = {}  # type: Dict[str, Tuple[ProductionRule, List[Predicate]]]
+# names of rules whose production depends on the reference time
+_ts_dependent_rules = set()  # type: Set[str]
+
+# The regular expressions in the pattern of a rule: the regex ids, each with the
+# number of other patterns between it and the previous regex (or the start), the
+# number of patterns after the last regex and the length of the pattern
+_RegexSkeleton = Tuple[Tuple[Tuple[int, int], ...], int, int]
+_ShapeFirsts = Tuple[FrozenSet[str], Tuple[Tuple[str, Predicate], ...]]
+_ShapePositions = Tuple[
+    Tuple[Tuple[str, int], ...], Optional[Tuple[Optional[Predicate], ...]]
+]
+_rule_skeletons = {}  # type: Dict[str, _RegexSkeleton]
+# names of rules by the id of the first regex in their pattern, and of rules
+# without a regex, see applicable_rules
+_rules_by_regex = {}  # type: Dict[int, Set[str]]
+_rules_without_regex = set()  # type: Set[str]
+# predicates whose result only depends on the shape of an artifact, see _by_shape
+_shape_predicates = set()  # type: Set[Predicate]
+# names of rules whose first pattern accepts an artifact of a given shape, and
+# the names and first predicates of rules for which this cannot be told from
+# the shape; filled on demand by rules_starting_with
+_rules_by_first_shape = {}  # type: Dict[Hashable, _ShapeFirsts]
+# (name, position) of the patterns that may accept an artifact of a given shape
+# and, unless all of them do, per position None if it does or the predicate to
+# evaluate; filled on demand by rule_positions
+_rule_positions_by_shape = {}  # type: Dict[Hashable, _ShapePositions]
 
 _regex_cnt = 100  # leave this much space for ids of production types
 _regex = {}  # compiled regex
 _regex_str = {}  # map regex id to original string
 _str_regex = {}  # type: Dict[str, int] # map regex raw str to regex id
+_regex_prefilter = {}  # type: Dict[int, Requirements] # map regex id to prefilter
 
 _regex_hour = r"(?:[01]?\d)|(?:2[0-3])"
 _regex_minute = r"[0-5]\d"
@@ -50,6 +95,14 @@ _defines = (
     regex_month=_regex_month,
     regex_year=_regex_year,
 )
+# the groups in _defines that rules can refer to via (?&name)
+_defined_groups = {
+    "_hour": _regex_hour,
+    "_minute": _regex_minute,
+    "_day": _regex_day,
+    "_month": _regex_month,
+    "_year": _regex_year,
+}
 
 
 def rule(*patterns: Union[str, Predicate]) -> Callable[[Any], ProductionRule]:
@@ -77,6 +130,8 @@ def rule(*patterns: Union[str, Predicate]) -> Callable[[Any], ProductionRule]:
             _regex_str[_regex_cnt] = p
             _str_regex[p] = _regex_cnt
             _regex[_regex_cnt] = new_rr
+            # requirements used to skip the regex on texts it cannot match
+            _regex_prefilter[_regex_cnt] = requirements(p, _defined_groups)
             _regex_cnt += 1
             return regex_match(_regex_cnt - 1)
         else:
@@ -107,30 +162,171 @@ def rule(*patterns: Union[str, Predicate]) -> Callable[[Any], ProductionRule]:
             return res
 
         rules[f.__name__] = (wrapper, mapped_patterns)
+        if _reads_first_arg(f):
+            _ts_dependent_rules.add(f.__name__)
+        _index_rule(f.__name__, _regex_skeleton(patterns))
         return wrapper
 
     return fwrapper
 
 
+def _regex_skeleton(patterns: Tuple[Union[str, Predicate], ...]) -> _RegexSkeleton:
+    regexes = []
+    gap = 0
+    for p in patterns:
+        if isinstance(p, str):
+            regexes.append((_str_regex[p], gap))
+            gap = 0
+        else:
+            gap += 1
+    return tuple(regexes), gap, len(patterns)
+
+
+def _index_rule(name: str, skeleton: _RegexSkeleton) -> None:
+    # a rule registered again under the same name replaces the previous one
+    _rules_by_first_shape.clear()
+    _rule_positions_by_shape.clear()
+    _rules_without_regex.discard(name)
+    for names in _rules_by_regex.values():
+        names.discard(name)
+    _rule_skeletons[name] = skeleton
+    if skeleton[0]:
+        _rules_by_regex.setdefault(skeleton[0][0][0], set()).add(name)
+    else:
+        _rules_without_regex.add(name)
+
+
+def _skeleton_match(skeleton: _RegexSkeleton, regex_ids: Tuple[int, ...]) -> bool:
+    # Aligning each regex to its first possible occurrence leaves the most room
+    # for the remaining ones, so the pattern can be aligned iff this succeeds
+    regexes, trailing, length = skeleton
+    if len(regex_ids) < length:
+        return False
+    pos = 0
+    for r_id, gap in regexes:
+        try:
+            pos = regex_ids.index(r_id, pos + gap) + 1
+        except ValueError:
+            return False
+    return len(regex_ids) - pos >= trailing
+
+
+def applicable_rules(
+    regex_ids: Tuple[int, ...]
+) -> Dict[str, Tuple[ProductionRule, List[Predicate]]]:
+    """Return the rules that can eventually be applied to a sequence of regex
+    matches with ids *regex_ids*, in the order they have been registered.
+
+    A rule qualifies if the regular expressions in its pattern occur in
+    *regex_ids* in the same order, with at least as many other matches in
+    between, before and after them as there are other patterns in the rule to
+    produce from them.
+    """
+    candidates = set(_rules_without_regex)
+    for r_id in set(regex_ids):
+        candidates.update(_rules_by_regex.get(r_id, ()))
+    return {
+        name: r
+        for name, r in rules.items()
+        if name in candidates and _skeleton_match(_rule_skeletons[name], regex_ids)
+    }
+
+
+def rules_starting_with(artifact: Artifact) -> FrozenSet[str]:
+    """Return the names of the rules whose pattern can start with *artifact*,
+    i.e. whose first predicate accepts it.
+    """
+    shape = artifact.shape
+    try:
+        names, unchecked = _rules_by_first_shape[shape]
+    except KeyError:
+        firsts = [(name, r[1][0]) for name, r in rules.items() if r[1]]
+        names = frozenset(
+            name for name, p in firsts if p in _shape_predicates and p(artifact)
+        )
+        unchecked = tuple((name, p) for name, p in firsts if p not in _shape_predicates)
+        _rules_by_first_shape[shape] = names, unchecked
+    if unchecked:
+        # other predicates can depend on more than the shape of artifact
+        return names.union(name for name, p in unchecked if p(artifact))
+    return names
+
+
+def rule_positions(artifact: Artifact) -> Tuple[Tuple[str, int], ...]:
+    """Return the (name, position) of all rules and positions in their pattern
+    at which *artifact* is accepted, in the order the rules were registered.
+    """
+    shape = artifact.shape
+    try:
+        positions, checks = _rule_positions_by_shape[shape]
+    except KeyError:
+        candidates = [
+            ((name, i), None if p in _shape_predicates else p)
+            for name, r in rules.items()
+            for i, p in enumerate(r[1])
+            if p not in _shape_predicates or p(artifact)
+        ]
+        positions = tuple(pos for pos, _ in candidates)
+        checks = tuple(p for _, p in candidates)
+        if not any(checks):
+            checks = None
+        _rule_positions_by_shape[shape] = positions, checks
+    if checks is None:
+        return positions
+    # other predicates can depend on more than the shape of artifact
+    return tuple(pos for pos, p in zip(positions, checks) if p is None or p(artifact))
+
+
+def _reads_first_arg(f: Callable[..., Any]) -> bool:
+    # True if the first argument of f (i.e. ts for a production rule) is
+    # accessed anywhere in its body, including nested functions
+    name = f.__code__.co_varnames[0]
+    for instr in dis.get_instructions(f):
+        if instr.opname.startswith("LOAD_") and (
+            instr.argval == name
+            or (isinstance(instr.argval, tuple) and name in instr.argval)
+        ):
+            return True
+    return False
+
+
+def _by_shape(test: Predicate) -> Predicate:
+    # evaluate test once per shape of the artifacts it is applied to; the
+    # name of test is kept, e.g. _regex_match for the predicates of regex_match
+    memo = {}  # type: Dict[Hashable, bool]
+
+    @wraps(test)
+    def _test(a: Artifact) -> bool:
+        shape = a.shape
+        try:
+            return memo[shape]
+        except KeyError:
+            res = memo[shape] = bool(test(a))
+            return res
+
+    _shape_predicates.add(_test)
+    return _test
+
+
 def regex_match(r_id: int) -> Predicate:
     def _regex_match(r: Artifact) -> bool:
         return type(r) == RegexMatch and r.id == r_id
 
-    return _regex_match
+    return _by_shape(_regex_match)
 
 
 def dimension(dim: Type[Artifact]) -> Predicate:
     def _dimension(d: Artifact) -> bool:
         return isinstance(d, dim)
 
-    return _dimension
+    return _by_shape(_dimension)
 
 
 def predicate(pred: str) -> Predicate:
     def _predicate(d: Artifact) -> Any:
         return getattr(d, pred, False)
 
-    return _predicate
+    return _by_shape(_predicate)
 
 
 from ctparse.time.rules import *  # noqa
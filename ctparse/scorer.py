@@ -5,7 +5,7 @@ implement scoring strategies for ctparse.
 from abc import ABCMeta, abstractmethod
 from datetime import datetime
 from random import Random
-from typing import Optional
+from typing import Optional, Sequence
 
 from ctparse.partial_parse import PartialParse
 from ctparse.types import Artifact
@@ -35,6 +35,40 @@ class Scorer(metaclass=ABCMeta):
         :param prod: the production
         """
 
+    def score_batch(
+        self, txt: str, ts: datetime, partial_parses: Sequence[PartialParse]
+    ) -> Sequence[float]:
+        """Produce scores for several partial productions of the same text.
+
+        The default implementation calls `score` on each partial parse; scorers
+        that can evaluate many parses at once more efficiently should override it.
+
+        :param txt:  the text that is being parsed
+        :param ts: the reference time
+        :param partial_parses: the partial parses that need to be scored
+        """
+        return [self.score(txt, ts, pp) for pp in partial_parses]
+
+    def score_final_batch(
+        self,
+        txt: str,
+        ts: datetime,
+        partial_parse: PartialParse,
+        prods: Sequence[Artifact],
+    ) -> Sequence[float]:
+        """Produce the final scores for several productions of the same partial
+        parse.
+
+        The default implementation calls `score_final` on each production;
+        scorers that can share work between the productions should override it.
+
+        :param txt: the text that is being parsed
+        :param ts: the reference time
+        :param partial_parse: the PartialParse object that generated the productions
+        :param prods: the productions
+        """
+        return [self.score_final(txt, ts, partial_parse, prod) for prod in prods]
+
 
 class DummyScorer(Scorer):
     """A scorer that always return a 0.0 score."""
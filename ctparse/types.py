@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict, Optional, Tuple, Type, TypeVar
+from typing import Any, Dict, Hashable, Optional, Tuple, Type, TypeVar
 
 import regex
 from regex import Regex
@@ -7,12 +7,33 @@ import enum
 
 T = TypeVar("T", bound="Artifact")
 
+_SPAN = ("mstart", "mend")
+
 
 class Artifact:
+    __slots__ = ("mstart", "mend", "_shape", "_hash")
+    # attributes compared by __eq__
+    _attrs = ("mstart", "mend")  # type: Tuple[str, ...]
+
     def __init__(self) -> None:
         self.mstart = 0
         self.mend = 0
-        self._attrs = ["mstart", "mend"]
+        self._shape = None  # type: Optional[Hashable]
+        self._hash = None  # type: Optional[int]
+
+    @property
+    def shape(self) -> Hashable:
+        """A compact signature of this artifact: its type and what rule patterns
+        can test on it, e.g. the regex id of a RegexMatch or which fields of a
+        Time are set. Rule predicates must give the same result for all
+        artifacts of the same shape. Computed on first access.
+        """
+        if self._shape is None:
+            self._shape = self._get_shape()
+        return self._shape
+
+    def _get_shape(self) -> Hashable:
+        return (type(self),)
 
     def update_span(self: T, *args: "Artifact") -> T:
         self.mstart = args[0].mstart
@@ -44,7 +65,28 @@ class Artifact:
             return all(getattr(self, a) == getattr(other, a) for a in self._attrs)
 
     def __hash__(self) -> int:
-        return hash(tuple(getattr(self, a) for a in self._attrs))
+        # The span is left out, so the hash can be cached although update_span
+        # (or mapping a resolution back to the original text) changes it later.
+        # All other attributes are never changed after construction.
+        if self._hash is None:
+            self._hash = hash(
+                tuple(getattr(self, a) for a in self._attrs if a not in _SPAN)
+            )
+        return self._hash
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # the cached hash is not valid in other processes (str hashes are salted)
+        state = dict(getattr(self, "__dict__", {}))
+        for cls in type(self).__mro__:
+            for a in getattr(cls, "__slots__", ()):
+                if hasattr(self, a):
+                    state[a] = getattr(self, a)
+        state["_hash"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for a, v in state.items():
+            setattr(self, a, v)
 
     def _hasOnly(self, *args: str) -> bool:
         """check that all attributes set to True are set (i.e. not None) and
@@ -65,9 +107,11 @@ class Artifact:
 
 
 class RegexMatch(Artifact):
+    __slots__ = ("key", "id", "match", "_text")
+    _attrs = ("mstart", "mend", "id")
+
     def __init__(self, id: int, m: Regex) -> None:
         super().__init__()
-        self._attrs = ["mstart", "mend", "id"]
         self.key = "R{}".format(id)
         self.id = id
         self.match = m
@@ -75,6 +119,9 @@ class RegexMatch(Artifact):
         self.mend = m.span(self.key)[1]
         self._text = m.group(self.key)
 
+    def _get_shape(self) -> Hashable:
+        return (RegexMatch, self.id)
+
     def __str__(self) -> str:
         return "{}:{}".format(self.id, self._text)
 
@@ -258,12 +305,20 @@ def _mk_pod_hours() -> Dict[str, Tuple[int, int]]:
 pod_hours = _mk_pod_hours()
 
 
+# bits of Time._fields, one per field in Time._attrs that is set
+_YEAR, _MONTH, _DAY, _HOUR, _MINUTE, _DOW, _POD = (1 << i for i in range(7))
+_DATE = _YEAR | _MONTH | _DAY
+
+
 _TIME_REGEX = regex.compile(
     r"(\d{4}|X)-(\d{2}|X)-(\d{2}|X) (\d{2}|X):(\d{2}|X) \((\d|X)\/(\w+)\)"
 )
 
 
 class Time(Artifact):
+    __slots__ = ("year", "month", "day", "hour", "minute", "DOW", "POD", "_fields")
+    _attrs = ("year", "month", "day", "hour", "minute", "DOW", "POD")
+
     def __init__(
         self,
         year: Optional[int] = None,
@@ -275,7 +330,6 @@ class Time(Artifact):
         POD: Optional[str] = None,
     ) -> None:
         super().__init__()
-        self._attrs = ["year", "month", "day", "hour", "minute", "DOW", "POD"]
         # Might add some validation here, did not to avoid the overhead
         self.year = year
         self.month = month
@@ -284,6 +338,14 @@ class Time(Artifact):
         self.minute = minute
         self.DOW = DOW
         self.POD = POD
+        # which fields are set, the predicates below only test this mask
+        self._fields = 0
+        for i, v in enumerate((year, month, day, hour, minute, DOW, POD)):
+            if v is not None:
+                self._fields |= 1 << i
+
+    def _get_shape(self) -> Hashable:
+        return (Time, self._fields)
 
     # -----------------------------------------------------------------------------
     # Make sure to not accidentially test bool(x) as False when x==0, but you meant
@@ -292,12 +354,12 @@ class Time(Artifact):
     @property
     def isDOY(self) -> bool:
         """isDayOfYear <=> a dd.mm but not year"""
-        return self._hasOnly("month", "day")
+        return self._fields == _MONTH | _DAY
 
     @property
     def isDOM(self) -> bool:
         """isDayOfMonth <=> a dd but no month"""
-        return self._hasOnly("day")
+        return self._fields == _DAY
 
     @property
     def isDOW(self) -> bool:
@@ -306,70 +368,68 @@ class Time(Artifact):
         however, the production rules do not do that.
 
         """
-        return self._hasOnly("DOW")
+        return self._fields == _DOW
 
     @property
     def isMonth(self) -> bool:
-        return self._hasOnly("month")
+        return self._fields == _MONTH
 
     @property
     def isPOD(self) -> bool:
         """isPartOfDay <=> morning, etc.; fragile, tests only that there is a
         POD and neither a full date nor a full time
         """
-        return self._hasOnly("POD")
+        return self._fields == _POD
 
     @property
     def isHour(self) -> bool:
         """only has an hour"""
-        return self._hasOnly("hour")
+        return self._fields == _HOUR
 
     @property
     def isTOD(self) -> bool:
         """isTimeOfDay - only a time, not date"""
-        return self._hasOnly("hour") or self._hasOnly("hour", "minute")
+        return self._fields in (_HOUR, _HOUR | _MINUTE)
 
     @property
     def isDate(self) -> bool:
         """isDate - only a date, not time"""
-        return self._hasOnly("year", "month", "day")
+        return self._fields == _DATE
 
     @property
     def isDateTime(self) -> bool:
         """a date and a time"""
-        return self._hasOnly("year", "month", "day", "hour") or self._hasOnly(
-            "year", "month", "day", "hour", "minute"
-        )
+        return self._fields in (_DATE | _HOUR, _DATE | _HOUR | _MINUTE)
 
     @property
     def isYear(self) -> bool:
         """just a year"""
-        return self._hasOnly("year")
+        return self._fields == _YEAR
 
     @property
     def hasDate(self) -> bool:
         """at least a date"""
-        return self._hasAtLeast("year", "month", "day")
+        return self._fields & _DATE == _DATE
 
     @property
     def hasDOY(self) -> bool:
         """at least a day of year"""
-        return self._hasAtLeast("month", "day")
+        return self._fields & (_MONTH | _DAY) == _MONTH | _DAY
 
     @property
     def hasDOW(self) -> bool:
         """at least a day of week"""
-        return self._hasAtLeast("DOW")
+        return bool(self._fields & _DOW)
 
     @property
     def hasTime(self) -> bool:
         """at least a time to the hour"""
-        return self._hasAtLeast("hour")
+        return bool(self._fields & _HOUR)
 
     @property
     def hasPOD(self) -> bool:
         """at least a part of day"""
-        return self._hasAtLeast("POD")
+        return bool(self._fields & _POD)
 
     def __str__(self) -> str:
         return "{}-{}-{} {}:{} ({}/{})".format(
@@ -444,14 +504,23 @@ class Time(Artifact):
 
 
 class Interval(Artifact):
+    __slots__ = ("t_from", "t_to")
+    _attrs = ("t_from", "t_to")
+
     def __init__(
         self, t_from: Optional[Time] = None, t_to: Optional[Time] = None
     ) -> None:
         super().__init__()
-        self._attrs = ["t_from", "t_to"]
         self.t_from = t_from
         self.t_to = t_to
 
+    def _get_shape(self) -> Hashable:
+        return (
+            Interval,
+            None if self.t_from is None else self.t_from._fields,
+            None if self.t_to is None else self.t_to._fields,
+        )
+
     @property
     def isTimeInterval(self) -> bool:
         if self.t_from is None or self.t_to is None:
@@ -504,6 +573,9 @@ class DurationUnit(enum.Enum):
 
 
 class Duration(Artifact):
+    __slots__ = ("value", "unit")
+    _attrs = ("mstart", "mend", "value", "unit")
+
     def __init__(self, value: int, unit: DurationUnit):
         """Create a Duration using value and unit.
 
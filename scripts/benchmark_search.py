@@ -0,0 +1,130 @@
+"""Compare the accuracy and latency of best-first and beam search on a corpus
+
+Accuracy is the share of test texts for which the parse returned by ctparse is
+the gold parse. Latency is the time ctparse takes to return it. The regular
+expression stage is included, i.e. the cache of its results is cleared before
+each text. All search strategies run on each text before moving on to the next
+one, so that they are affected alike by noise on the machine.
+"""
+import argparse
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Sequence, Tuple
+
+from ctparse import clear_cache, ctparse, preload
+from ctparse.corpus import load_timeparse_corpus
+from ctparse.time import auto_corpus, corpus
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--legacy",
+        help="Use legacy dataset (ctparse.time.corpus and ctparse.time.auto_corpus)",
+        action="store_true",
+    )
+    parser.add_argument("--dataset", help="Dataset file")
+    parser.add_argument(
+        "--timeout", help="Timeout per text in seconds", type=float, default=1.0
+    )
+    parser.add_argument(
+        "--max-stack-depth",
+        help="Stack depth of best-first search",
+        type=int,
+        default=10,
+    )
+    parser.add_argument(
+        "--beam-width",
+        help="Beam widths to compare",
+        type=int,
+        nargs="+",
+        default=[3, 6],
+    )
+    parser.add_argument(
+        "--max-expansions",
+        help="Expansion budget of beam search, 0 for none",
+        type=int,
+        default=200,
+    )
+    return parser.parse_args()
+
+
+def load_tests(args) -> List[Tuple[str, datetime, str]]:
+    # (text, reference time, no-bound string of the gold parse)
+    tests = []
+    if args.legacy:
+        for target, ts, texts in corpus.corpus + auto_corpus.corpus:
+            ref_time = datetime.strptime(ts, "%Y-%m-%dT%H:%M")
+            tests.extend((text, ref_time, target) for text in texts)
+    if args.dataset:
+        for entry in load_timeparse_corpus(args.dataset):
+            tests.append((entry.text, entry.ts, entry.gold.nb_str()))
+    return tests
+
+
+def best_is_gold(text: str, ts: datetime, target: str, **kwargs: Any) -> bool:
+    parse = ctparse(text, ts, latent_time=False, **kwargs)
+    return parse is not None and parse.resolution.nb_str() == target
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s"
+    )
+    # ctparse warns about each text it finds no parse for
+    logging.getLogger("ctparse.ctparse").setLevel(logging.ERROR)
+    tests = load_tests(args)
+    if not tests:
+        raise ValueError("Need to specify at least a dataset for benchmarking")
+
+    strategies = {
+        "best-first (max_stack_depth={})".format(args.max_stack_depth): {
+            "max_stack_depth": args.max_stack_depth
+        }
+    }  # type: Dict[str, Dict[str, Any]]
+    for beam_width in args.beam_width:
+        name = "beam (beam_width={}, max_expansions={})".format(
+            beam_width, args.max_expansions
+        )
+        strategies[name] = {
+            "beam_width": beam_width,
+            "max_expansions": args.max_expansions,
+        }
+
+    preload()
+    latencies = {name: [] for name in strategies}  # type: Dict[str, List[float]]
+    n_correct = dict.fromkeys(strategies, 0)
+    logger.info("Running {} tests".format(len(tests)))
+    for text, ts, target in tests:
+        for name, kwargs in strategies.items():
+            clear_cache()
+            t0 = time.perf_counter()
+            n_correct[name] += best_is_gold(
+                text, ts, target, timeout=args.timeout, **kwargs
+            )
+            latencies[name].append(time.perf_counter() - t0)
+
+    print("{:<45} {:>9} {:>9} {:>9} {:>9}".format("", "accuracy", "p50", "p99", "max"))
+    for name in strategies:
+        lat = sorted(latencies[name])
+        print(
+            "{:<45} {:>9.4f} {:>7.1f}ms {:>7.1f}ms {:>7.1f}ms".format(
+                name,
+                n_correct[name] / len(tests),
+                1000 * percentile(lat, 0.5),
+                1000 * percentile(lat, 0.99),
+                1000 * lat[-1],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
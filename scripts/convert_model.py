@@ -0,0 +1,38 @@
+"""Convert a bz2 pickled naive bayes model to the binary model format"""
+import argparse
+import bz2
+import logging
+import pickle
+
+from ctparse.loader import DEFAULT_BINARY_MODEL_FILE, DEFAULT_MODEL_FILE
+from ctparse.nb_model_file import save_binary_model
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input", help="Pickled model file", default=DEFAULT_MODEL_FILE
+    )
+    parser.add_argument(
+        "--output", help="Binary model file", default=DEFAULT_BINARY_MODEL_FILE
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s"
+    )
+
+    logger.info("Loading model {}".format(args.input))
+    with bz2.open(args.input, "rb") as fd:
+        mdl = pickle.load(fd)
+    logger.info("Writing binary model {}".format(args.output))
+    save_binary_model(mdl, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,8 @@ import argparse
 import logging
 
 from ctparse.corpus import load_timeparse_corpus, make_partial_rule_dataset, run_corpus
-from ctparse.loader import DEFAULT_MODEL_FILE
+from ctparse.loader import DEFAULT_BINARY_MODEL_FILE, DEFAULT_MODEL_FILE
+from ctparse.nb_model_file import save_binary_model
 from ctparse.nb_scorer import save_naive_bayes, train_naive_bayes
 from ctparse.scorer import DummyScorer
 from ctparse.time import auto_corpus, corpus
@@ -57,6 +58,7 @@ def main():
 
     mdl = train_naive_bayes(X_combined, y_combined)
     save_naive_bayes(mdl, DEFAULT_MODEL_FILE)
+    save_binary_model(mdl, DEFAULT_BINARY_MODEL_FILE)
 
 
 if __name__ == "__main__":
@@ -42,6 +42,9 @@ setup(
         "regex>=2018.6.6",
         "tqdm>=4.23.4,<5.0.0",
     ],
+    extras_require={
+        "numpy": ["numpy>=1.16.0", "scipy>=1.2.0"],
+    },
     license="MIT license",
     long_description=readme + "\n\n" + history,
     include_package_data=True,
@@ -49,7 +52,7 @@ setup(
     name="ctparse",
     packages=find_packages(include=["ctparse*"]),
     package_dir={"ctparse": "ctparse"},
-    package_data={"ctparse": ["models/model.pbz", "py.typed"]},
+    package_data={"ctparse": ["models/model.pbz", "models/model.ctpnb", "py.typed"]},
     setup_requires=setup_requirements,
     test_suite="tests",
     tests_require=test_requirements,
@@ -0,0 +1,137 @@
+from datetime import datetime
+
+import pytest
+
+import ctparse.cache as cache_module
+from ctparse.cache import CacheInfo, LRUCache, ParseCache
+from ctparse.ctparse import ctparse, ctparse_gen
+from ctparse.types import Time
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=1)
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    cache.put("b", 2)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.cache_info() == CacheInfo(hits=2, misses=2, maxsize=1, currsize=1)
+
+
+def test_lru_cache_cost():
+    cache = LRUCache(maxsize=10, max_cost=5)
+    cache.put("a", 1, cost=2)
+    cache.put("b", 2, cost=2)
+    assert cache.get("a") == 1
+    # b was least recently used
+    cache.put("c", 3, cost=3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    # replacing an entry replaces its cost
+    cache.put("c", 4, cost=1)
+    cache.put("d", 5, cost=2)
+    assert len(cache) == 3
+    # entries costing more than max_cost are not stored
+    cache.put("e", 6, cost=6)
+    assert cache.get("e") is None
+    assert len(cache) == 3
+    cache.clear()
+    cache.put("f", 7, cost=5)
+    assert cache.get("f") == 7
+
+
+def test_parse_cache_lru():
+    cache = ParseCache(maxsize=2)
+    ts = datetime(2020, 1, 1)
+    assert cache.lookup("a", ts) is None
+    cache.store("a", ts, False, [1])
+    cache.store("b", ts, False, [2])
+    assert cache.lookup("a", ts) == [1]
+    cache.store("c", ts, False, [3])
+    # b was least recently used
+    assert cache.lookup("b", ts) is None
+    assert cache.lookup("a", ts) == [1]
+    assert cache.lookup("c", ts) == [3]
+    assert cache.cache_info() == CacheInfo(hits=3, misses=2, maxsize=2, currsize=2)
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.cache_info() == CacheInfo(hits=0, misses=0, maxsize=2, currsize=0)
+
+    with pytest.raises(ValueError):
+        ParseCache(maxsize=0)
+
+
+def test_parse_cache_ts_dependent():
+    cache = ParseCache()
+    ts1 = datetime(2020, 1, 1)
+    ts2 = datetime(2020, 1, 2)
+    cache.store("a", ts1, True, [1])
+    assert cache.lookup("a", ts1) == [1]
+    assert cache.lookup("a", ts2) is None
+    cache.store("a", ts2, True, [])
+    assert cache.lookup("a", ts2) == []
+    assert cache.lookup("a", ts1) == [1]
+
+
+def test_parse_cache_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module, "monotonic", lambda: now[0])
+    cache = ParseCache(ttl=10)
+    ts = datetime(2020, 1, 1)
+    cache.store("a", ts, False, [1])
+    now[0] = 109.0
+    assert cache.lookup("a", ts) == [1]
+    now[0] = 111.0
+    assert cache.lookup("a", ts) is None
+    assert len(cache) == 0
+
+
+def test_ctparse_cache():
+    cache = ParseCache()
+    ts = datetime(2020, 1, 1, 7, 0)
+    expected = ctparse("12.12.2020 8:00 pm", ts=ts)
+    assert expected
+    for _ in range(2):
+        parse = ctparse("12.12.2020 8:00 pm", ts=ts, cache=cache)
+        assert parse
+        assert parse.resolution == expected.resolution
+        assert parse.production == expected.production
+        assert parse.score == expected.score
+    assert cache.cache_info().hits == 1
+    # the result does not depend on ts, the latent time postprocessing does
+    parse = ctparse("8:00 pm", ts=ts, cache=cache)
+    assert parse and parse.resolution == Time(2020, 1, 1, 20, 0)
+    parse = ctparse("8:00 pm", ts=datetime(2020, 1, 2, 21, 0), cache=cache)
+    assert parse and parse.resolution == Time(2020, 1, 3, 20, 0)
+    assert cache.cache_info().hits == 2
+
+
+def test_ctparse_cache_ts_dependent():
+    cache = ParseCache()
+    for day in (1, 2, 1):
+        parse = ctparse("tomorrow", ts=datetime(2020, 1, day), cache=cache)
+        assert parse and parse.resolution == Time(2020, 1, day + 1)
+    assert cache.cache_info().hits == 1
+
+
+def test_ctparse_cache_copies():
+    cache = ParseCache()
+    ts = datetime(2020, 1, 1)
+    parse = ctparse("12.12.2020", ts=ts, cache=cache)
+    assert parse
+    parse.resolution.mstart = 3
+    parse = ctparse("12.12.2020", ts=ts, cache=cache)
+    assert parse and parse.resolution.mstart == 0
+
+
+def test_ctparse_cache_incomplete():
+    cache = ParseCache()
+    ts = datetime(2020, 1, 1)
+    # partially consumed generators do not store results
+    next(ctparse_gen("12.12.2020 8:00 pm", ts=ts, cache=cache))
+    assert len(cache) == 0
+    # timed out searches neither
+    ctparse("12.12.2020 8:00 pm", ts=ts, cache=cache, timeout=1e-9)
+    assert len(cache) == 0
@@ -0,0 +1,162 @@
+import os
+from datetime import datetime
+from typing import Any, List, Sequence, Tuple
+
+from ctparse.cache import ParseCache
+from ctparse.chart import Chart
+from ctparse.corpus import load_timeparse_corpus
+from ctparse.ctparse import (
+    ctparse,
+    ctparse_gen,
+    _match_regex,
+    _preprocess_string,
+    _regex_successors,
+)
+from ctparse.partial_parse import PartialParse
+from ctparse.rule import _regex as global_regex, _regex_prefilter
+from ctparse.types import Interval, Time
+
+CORPUS_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "datasets", "timeparse_corpus.json"
+)
+
+
+def _zero_scores(pps: Sequence[PartialParse]) -> List[float]:
+    return [0.0] * len(pps)
+
+
+def _chart(txt: str, ts: datetime) -> Chart:
+    txt = _preprocess_string(txt)
+    matches = _match_regex(txt, global_regex, _regex_prefilter)
+    chart = Chart(matches, _regex_successors(txt, matches)[0])
+    chart.build(ts, _zero_scores)
+    return chart
+
+
+def test_chart():
+    ts = datetime(2020, 1, 1)
+    chart = _chart("on 5pm", ts)
+    hhmm = [
+        item
+        for item in chart.items.values()
+        if item.artifact == Time(hour=17, minute=0)
+    ]
+    # ruleAbsorbOnTime returns its argument: the absorbed time keeps its span
+    assert [(t.first, t.last) for t in hhmm] == [(4, 4), (0, 4)]
+    assert [(t.artifact.mstart, t.artifact.mend) for t in hhmm] == [(3, 6), (0, 6)]
+    assert hhmm[1].rules == (100, 131, "ruleHHMM", "ruleAbsorbOnTime")
+    # items a rule was applied to are not final, regex matches never are
+    final = chart.final_items()
+    assert hhmm[1] in final
+    assert hhmm[0] not in final
+    assert all(isinstance(item.artifact, Time) for item in final)
+    # "on 5" is resolved by ruleLatentDOM before and after ruleAbsorbOnTime,
+    # the resolution is held once for "5" and once for "on 5"
+    latent = [
+        item for item in chart.items.values() if item.artifact == Time(2020, 1, 5)
+    ]
+    assert [(t.first, t.last) for t in latent] == [(2, 2), (0, 2)]
+
+    assert not _chart("nothing to see here", ts).final_items()
+
+
+def test_chart_shared_derivations(monkeypatch):
+    # each rule is applied only once to the same artifacts
+    applied = []  # type: List[Tuple[Any, ...]]
+    apply = Chart._apply
+
+    def _apply(ts: datetime, production: Any, args: List[Any]) -> Any:
+        applied.append((production,) + tuple(id(a) for a in args))
+        return apply(ts, production, args)
+
+    monkeypatch.setattr(Chart, "_apply", staticmethod(_apply))
+    chart = _chart("Mo 5.3., Di 6.3., Mi 7.3. jeweils 9-17 Uhr", datetime(2020, 1, 1))
+    assert applied
+    assert len(set(applied)) == len(applied)
+    assert chart.final_items()
+
+
+def test_chart_best_derivation():
+    # of several derivations of the same artifact the best scored is kept
+    def score_batch(pps: Sequence[PartialParse]) -> List[float]:
+        return [-float(len(pp.rules)) for pp in pps]
+
+    txt = "12.12.2020 9-17 Uhr"
+    matches = _match_regex(txt, global_regex, _regex_prefilter)
+    chart = Chart(matches, _regex_successors(txt, matches)[0])
+    chart.build(datetime(2020, 1, 1), score_batch)
+    for item in chart.items.values():
+        if item.rule_names:
+            assert item.score == -len(item.rules)
+    assert any(isinstance(item.artifact, Interval) for item in chart.final_items())
+
+
+def test_chart_corpus_parity():
+    for entry in load_timeparse_corpus(CORPUS_FILE)[::10]:
+        chart = _chart(entry.text, entry.ts)
+        derived = {item.artifact for item in chart.items.values()}
+        # everything the search produces is derived in the chart as well
+        for parse in ctparse_gen(entry.text, entry.ts, timeout=0, latent_time=False):
+            assert parse
+            assert parse.resolution in derived
+        # if the chart emits the best parse of the search, it is its best too
+        best = ctparse(entry.text, entry.ts, timeout=0, latent_time=False)
+        emitted = ctparse_gen(
+            entry.text, entry.ts, timeout=0, latent_time=False, chart=True
+        )
+        if best and any(p and p.production == best.production for p in emitted):
+            chart_best = ctparse(
+                entry.text, entry.ts, timeout=0, latent_time=False, chart=True
+            )
+            assert chart_best
+            assert chart_best.resolution == best.resolution
+            assert chart_best.production == best.production
+
+
+def test_chart_rule_order():
+    # the rules of the derivations of adjacent items are put in the best
+    # scored order, as the search does
+    ts = datetime(2017, 8, 20)
+    best = ctparse("Montag 21.08", ts, latent_time=False)
+    chart_best = ctparse("Montag 21.08", ts, latent_time=False, chart=True)
+    assert best and chart_best
+    assert chart_best.production == best.production
+    assert best.production[2:] == (
+        "ruleDDMM",
+        "ruleLatentDOY",
+        "ruleNamedDOW",
+        "ruleDOWDate",
+    )
+
+    # the search scores a production by all rules of its partial parse, here
+    # including ruleToday, the chart by the derivation of the production only
+    ts = datetime(2016, 11, 21)
+    best = ctparse("heute 21.11.", ts, latent_time=False)
+    chart_best = ctparse("heute 21.11.", ts, latent_time=False, chart=True)
+    assert best and chart_best
+    assert best.resolution == Time(year=2016, month=11, day=21)
+    assert best.production == (112, 126, "ruleDDMM", "ruleLatentDOY", "ruleToday")
+    assert chart_best.resolution == Time(
+        year=2016, month=11, day=21, hour=21, minute=11
+    )
+
+
+def test_ctparse_chart():
+    ts = datetime(2020, 12, 1)
+    res = ctparse("12.12.2020 9-17 Uhr", ts=ts, chart=True)
+    assert res
+    assert res.resolution == Interval(
+        Time(year=2020, month=12, day=12, hour=9, minute=0),
+        Time(year=2020, month=12, day=12, hour=17, minute=0),
+    )
+    assert res.production[:4] == (128, 131, 125, 131)
+    assert ctparse("gargelbabel", ts=ts, chart=True) is None
+
+    # the parses of the chart parser are cached separately
+    cache = ParseCache()
+    for chart in (True, False, True):
+        cached = ctparse("5.3. 9-17 Uhr", ts=ts, chart=chart, cache=cache)
+        parse = ctparse("5.3. 9-17 Uhr", ts=ts, chart=chart)
+        assert cached and parse
+        assert cached.production == parse.production
+    assert cache.cache_info().hits == 1
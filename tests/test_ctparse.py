@@ -1,6 +1,44 @@
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from ctparse.ctparse import ctparse, ctparse_gen, _match_rule
-from ctparse.types import Interval, Time, Artifact
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import pytest
+
+import regex
+
+from ctparse.cache import ParseCache
+from ctparse.corpus import load_timeparse_corpus
+from ctparse.ctparse import (
+    clear_cache,
+    ctparse,
+    ctparse_batch,
+    ctparse_document,
+    ctparse_gen,
+    preload,
+    set_regex_cache,
+    _match_regex,
+    _match_rule,
+    _preprocess_string,
+    _preprocess_string_spans,
+    _regex_stack,
+)
+from ctparse.nb_scorer import NaiveBayesScorer
+from ctparse.partial_parse import PartialParse
+from ctparse.scorer import DummyScorer
+from ctparse.rule import (
+    _regex as global_regex,
+    _regex_prefilter,
+    rules as global_rules,
+    rules_starting_with,
+)
+from ctparse.types import Interval, RegexMatch, Time, Artifact
+
+CORPUS_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "datasets", "timeparse_corpus.json"
+)
 
 
 def test_ctparse():
@@ -39,6 +77,329 @@ def test_match_rule():
     assert list(_match_rule([Artifact()], [])) == []
 
 
+def test_match_rule_starts():
+    # restricting the start positions to those given by rules_starting_with
+    # gives the same matches, on regex stacks and productions derived from them
+    ts = datetime(2020, 1, 1)
+    for entry in load_timeparse_corpus(CORPUS_FILE)[:50]:
+        txt = _preprocess_string(entry.text)
+        prods = list(
+            _regex_stack(txt, _match_regex(txt, global_regex))
+        )  # type: List[Tuple[Artifact, ...]]
+        for prod in prods:
+            for name, (production, patterns) in global_rules.items():
+                starts = [
+                    i for i, a in enumerate(prod) if name in rules_starting_with(a)
+                ]
+                matches = list(_match_rule(prod, patterns))
+                assert list(_match_rule(prod, patterns, starts)) == matches
+                for i_s, i_e in matches:
+                    new_a = production(ts, *prod[i_s:i_e])
+                    if new_a is not None and len(prods) < 200:
+                        prods.append(prod[:i_s] + (new_a,) + prod[i_e:])
+
+
+def test_match_regex_corpus_parity():
+    # every pattern scanned on its own must give exactly the same matches,
+    # regardless of patterns skipped by the prefilter
+    for entry in load_timeparse_corpus(CORPUS_FILE):
+        txt = _preprocess_string(entry.text)
+        expected = {
+            (r_id, m.span("R{}".format(r_id)))
+            for r_id, re in global_regex.items()
+            for m in re.finditer(txt, overlapped=True)
+        }
+        for prefilter in (None, _regex_prefilter):
+            matches = _match_regex(txt, global_regex, prefilter)
+            assert len(matches) == len(expected)
+            assert {(m.id, (m.mstart, m.mend)) for m in matches} == expected
+            assert matches == sorted(matches, key=lambda m: (m.mstart, m.mend, m.id))
+
+
+def _regex_stack_reference(
+    txt: str, regex_matches: List[RegexMatch]
+) -> List[Tuple[RegexMatch, ...]]:
+    # straightforward version checking all pairs of matches for a gap
+    n_rm = len(regex_matches)
+    succ = [
+        [
+            j
+            for j in range(i + 1, n_rm)
+            if regex_matches[j].mstart >= regex_matches[i].mend
+            and not txt[regex_matches[i].mend : regex_matches[j].mstart].strip()
+        ]
+        for i in range(n_rm)
+    ]
+    has_pred = {j for s in succ for j in s}
+    stack = [
+        (i,) for i in reversed(range(n_rm)) if i not in has_pred
+    ]  # type: List[Tuple[int, ...]]
+    prods = []
+    while stack:
+        s = stack.pop()
+        for j in succ[s[-1]]:
+            stack.append(s + (j,))
+        if not succ[s[-1]]:
+            prods.append(tuple(regex_matches[i] for i in s))
+    return prods
+
+
+def test_regex_stack():
+    txt = "Tomorrow I want to go   between 2 pm and 5pm"
+    spans = [(0, 8), (32, 33), (34, 35), (34, 36), (41, 42), (42, 44)]
+    matches = [
+        RegexMatch(100, regex.match(r".*(?P<R100>{})".format(txt[s:e]), txt[:e]))
+        for s, e in spans
+    ]
+    assert [(m.mstart, m.mend) for m in matches] == spans
+    prods = _regex_stack(txt, matches)
+    assert [[(m.mstart, m.mend) for m in p] for p in prods] == [
+        [(0, 8)],
+        [(32, 33), (34, 36)],
+        [(32, 33), (34, 35)],
+        [(41, 42), (42, 44)],
+    ]
+
+
+def test_regex_stack_corpus_parity():
+    for entry in load_timeparse_corpus(CORPUS_FILE)[::7]:
+        txt = _preprocess_string(entry.text)
+        matches = _match_regex(txt, global_regex, _regex_prefilter)
+        assert _regex_stack(txt, matches) == _regex_stack_reference(txt, matches)
+
+
+class _SortedStack:
+    # the stack of the search as it was before Frontier: a list sorted after
+    # each extension, truncated and popped from the end
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.stack = []  # type: List[PartialParse]
+
+    def __len__(self) -> int:
+        return len(self.stack)
+
+    def extend(self, pps: Iterable[PartialParse]) -> None:
+        self.stack.extend(pps)
+        self.stack.sort()
+        self.stack = self.stack[-self.max_size :]
+
+    def push(self, pp: PartialParse) -> bool:
+        self.extend([pp])
+        return any(s is pp for s in self.stack)
+
+    def pop(self) -> PartialParse:
+        return self.stack.pop()
+
+
+@pytest.mark.parametrize(
+    "max_stack_depth,scorer", [(3, None), (10, None), (10, DummyScorer())]
+)
+def test_frontier_corpus_parity(monkeypatch, max_stack_depth, scorer):
+    # the same parses in the same order as with a sorted list as stack; the
+    # dummy scorer scores all partial parses the same, so ties are decided by
+    # the order they were added in
+    def parses(txt: str) -> List[Tuple[str, Tuple[Union[int, str], ...], float]]:
+        return [
+            (repr(p.resolution), p.production, p.score)
+            for p in ctparse_gen(
+                txt,
+                ts=datetime(2020, 1, 1),
+                timeout=0,
+                max_stack_depth=max_stack_depth,
+                scorer=scorer,
+                latent_time=False,
+            )
+            if p
+        ]
+
+    ctparse_module = sys.modules["ctparse.ctparse"]
+    for entry in load_timeparse_corpus(CORPUS_FILE)[::20]:
+        expected = parses(entry.text)
+        with monkeypatch.context() as m:
+            m.setattr(ctparse_module, "Frontier", _SortedStack)
+            assert parses(entry.text) == expected
+
+
+class _CountingScorer(DummyScorer):
+    # counts the calls to score_batch with candidate productions
+    def __init__(self) -> None:
+        self.n_batches = 0
+
+    def score_batch(
+        self, txt: str, ts: datetime, partial_parses: Sequence[PartialParse]
+    ) -> Sequence[float]:
+        self.n_batches += bool(partial_parses)
+        return super().score_batch(txt, ts, partial_parses)
+
+
+def test_beam_search():
+    def parses(txt: str, **kwargs: Any) -> List[Tuple[str, float]]:
+        return [
+            (repr(p.resolution), p.score)
+            for p in ctparse_gen(txt, ts=datetime(2020, 1, 1), timeout=0, **kwargs)
+            if p
+        ]
+
+    for txt in ["tomorrow at 5 pm", "12.12.2020 9-17 Uhr", "Monday 10:00 - 12:00"]:
+        # beams too wide to evict anything search as an unlimited stack
+        unlimited = parses(txt, max_stack_depth=0)
+        assert parses(txt, beam_width=1000) == unlimited
+        assert parses(txt, max_expansions=100000) == unlimited
+        # narrow beams and a small budget still give a parse
+        assert parses(txt, beam_width=1, max_expansions=1)
+
+        # no more than max_expansions stack elements are expanded, the
+        # initial stack is scored in one additional batch
+        scorer = _CountingScorer()
+        assert parses(txt, scorer=scorer, max_expansions=2)
+        assert scorer.n_batches <= 3
+
+    # the parses of beam search are cached separately
+    cache = ParseCache()
+    txt = "tomorrow at 5 pm"
+    assert parses(txt, cache=cache) == parses(txt)
+    assert parses(txt, cache=cache, beam_width=1, max_expansions=1) == parses(
+        txt, beam_width=1, max_expansions=1
+    )
+
+
+def test_preprocess_string_spans():
+    txt = "  Meet (tomorrow),\n\tat 5pm \u2013\u2014 6pm; ok  "
+    pre, spans = _preprocess_string_spans(txt)
+    assert pre == _preprocess_string(txt) == "Meet tomorrow at 5pm - 6pm ok"
+    assert len(spans) == len(pre)
+    assert txt[spans[5][0] : spans[12][1]] == "tomorrow"
+    assert txt[spans[21][0] : spans[21][1]] == "\u2013\u2014"
+    for entry in load_timeparse_corpus(CORPUS_FILE)[::10]:
+        assert _preprocess_string_spans(entry.text)[0] == _preprocess_string(entry.text)
+
+
+def test_ctparse_document():
+    txt = (
+        "Hi,\n\nlet's meet tomorrow at 5 pm. Otherwise,\n"
+        "we could try on 12.12.2020?\n\nCheers"
+    )
+    ts = datetime(2020, 12, 1, 9, 0)
+    parses = ctparse_document(txt, ts=ts)
+    assert [txt[p.resolution.mstart : p.resolution.mend] for p in parses] == [
+        "tomorrow at 5 pm.",
+        "on 12.12.2020",
+    ]
+    assert parses[0].resolution == Time(2020, 12, 2, 17, 0)
+    assert parses[1].resolution == Time(2020, 12, 12)
+
+    with ThreadPoolExecutor(2) as executor:
+        parallel = ctparse_document(txt, ts=ts, executor=executor)
+    assert [(p.resolution, p.score) for p in parallel] == [
+        (p.resolution, p.score) for p in parses
+    ]
+
+    assert ctparse_document("nothing to see here", ts=ts) == []
+
+
+def test_ctparse_batch():
+    entries = load_timeparse_corpus(CORPUS_FILE)[::20]
+    items = [
+        (e.text, e.ts) for e in entries
+    ]  # type: List[Tuple[str, Optional[datetime]]]
+    items.append(("nothing to see here", None))
+    parses = ctparse_batch(items, timeout=0)
+    assert len(parses) == len(items)
+    for (txt, ts), parse in zip(items, parses):
+        expected = ctparse(txt, ts, timeout=0)
+        if expected is None:
+            assert parse is None
+        else:
+            assert parse
+            assert parse.resolution == expected.resolution
+            assert parse.production == expected.production
+            assert parse.score == expected.score
+    assert ctparse_batch([]) == []
+
+    # all parameters of ctparse are passed on
+    variants = [
+        {"beam_width": 1, "max_expansions": 1},
+        {"chart": True},
+    ]  # type: List[Dict[str, Any]]
+    for kwargs in variants:
+        parses = ctparse_batch(items, timeout=0, **kwargs)
+        for (txt, ts), parse in zip(items, parses):
+            assert repr(parse) == repr(ctparse(txt, ts, timeout=0, **kwargs))
+
+
+def test_front_cache():
+    ctparse_module = sys.modules["ctparse.ctparse"]
+    txt = "tomorrow at 14:30"
+    clear_cache()
+    parses = []
+    for day in (1, 2):
+        parse = ctparse(txt, ts=datetime(2020, 1, day))
+        assert parse
+        parses.append(parse)
+    assert ctparse_module._front_cache.cache_info().hits == 1
+    assert ctparse_module._front_cache.cache_info().misses == 1
+    clear_cache()
+    parse = ctparse(txt, ts=datetime(2020, 1, 2))
+    assert parse
+    assert parse.resolution == parses[1].resolution
+    assert parse.production == parses[1].production
+    assert parse.score == parses[1].score
+    assert parse.resolution != parses[0].resolution
+
+    try:
+        # texts whose sequences have too many matches are not cached
+        set_regex_cache(max_matches=3)
+        assert ctparse(txt, ts=datetime(2020, 1, 2))
+        assert len(ctparse_module._front_cache) == 0
+        # the cache can be turned off
+        set_regex_cache(maxsize=0)
+        assert ctparse_module._front_cache is None
+        clear_cache()
+        parse = ctparse(txt, ts=datetime(2020, 1, 2))
+        assert parse
+        assert parse.production == parses[1].production
+    finally:
+        set_regex_cache()
+
+
+def test_front_cache_threads():
+    # the cache is shared by threads that evict each other's entries
+    set_regex_cache(maxsize=2)
+    try:
+        txts = ["{} at {}:30".format(d, h) for d in ("today", "Monday") for h in (8, 9)]
+        expected = [ctparse(txt, ts=datetime(2020, 1, 1)) for txt in txts]
+        with ThreadPoolExecutor(4) as executor:
+            results = list(
+                executor.map(
+                    lambda txt: ctparse(txt, ts=datetime(2020, 1, 1)), txts * 25
+                )
+            )
+        assert [repr(r) for r in results] == [repr(e) for e in expected] * 25
+    finally:
+        set_regex_cache()
+
+
+def test_default_scorer_lazy(monkeypatch):
+    # importing ctparse does not load the model
+    out = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            "import sys, ctparse; "
+            "print(sys.modules['ctparse.ctparse']._DEFAULT_SCORER)",
+        ]
+    )
+    assert out.strip() == b"None"
+
+    ctparse_module = sys.modules["ctparse.ctparse"]
+    monkeypatch.setattr(ctparse_module, "_DEFAULT_SCORER", None)
+    preload()
+    scorer = ctparse_module._DEFAULT_SCORER
+    assert isinstance(scorer, NaiveBayesScorer)
+    preload()
+    assert ctparse_module._DEFAULT_SCORER is scorer
+
+
 def test_latent_time():
     parse = ctparse("8:00 pm", ts=datetime(2020, 1, 1, 7, 0), latent_time=False)
     assert parse
@@ -0,0 +1,163 @@
+import pickle
+from datetime import datetime
+
+import pytest
+
+from ctparse.count_vectorizer import CountVectorizer
+from ctparse.nb_estimator import MultinomialNaiveBayes
+from ctparse.nb_model_file import (
+    MAGIC,
+    MappedVocabulary,
+    is_binary_model,
+    load_binary_model,
+    ngram_codes,
+    save_binary_model,
+)
+from ctparse.nb_scorer import (
+    NaiveBayesScorer,
+    _NgramIndex,
+    save_naive_bayes,
+    train_naive_bayes,
+)
+from ctparse.partial_parse import PartialParse
+from ctparse.pipeline import CTParsePipeline
+from ctparse.types import Time
+
+X = [
+    ["ruleToday", "ruleTime", "ruleDateTime"],
+    ["ruleNamedHour", "ruleTime"],
+    ["ruleToday", "ruleNamedHour", "ruleÄ"],
+]
+y = [True, False, True]
+
+
+@pytest.fixture
+def model():
+    return train_naive_bayes(X, y)
+
+
+def test_roundtrip(tmp_path, model):
+    path = str(tmp_path / "model.ctpnb")
+    save_binary_model(model, path)
+    assert is_binary_model(path)
+
+    loaded = load_binary_model(path)
+    assert loaded.transformer.ngram_range == model.transformer.ngram_range
+    assert loaded.transformer.vocabulary is not None
+    assert dict(loaded.transformer.vocabulary) == model.transformer.vocabulary
+    assert loaded.estimator.alpha == model.estimator.alpha
+    assert loaded.estimator.class_prior == model.estimator.class_prior
+    for cls in ("negative_class", "positive_class"):
+        assert list(loaded.estimator.log_likelihood[cls]) == list(
+            model.estimator.log_likelihood[cls]
+        )
+    X_test = X + [["ruleTime", "ruleUnknown"], []]
+    assert loaded.predict_log_proba(X_test) == model.predict_log_proba(X_test)
+
+
+def test_mapped_vocabulary(tmp_path, model):
+    path = str(tmp_path / "model.ctpnb")
+    save_binary_model(model, path)
+    vocabulary = load_binary_model(path).transformer.vocabulary
+    assert isinstance(vocabulary, MappedVocabulary)
+
+    expected = model.transformer.vocabulary
+    assert len(vocabulary) == len(expected)
+    assert list(vocabulary) == sorted(expected)
+    for feature, idx in expected.items():
+        assert feature in vocabulary
+        assert vocabulary[feature] == idx
+        # memoized lookup
+        assert vocabulary.get(feature) == idx
+    assert "ruleUnknown" not in vocabulary
+    assert vocabulary.get("ruleUnknown", -1) == -1
+    assert 1 not in vocabulary
+    with pytest.raises(KeyError):
+        vocabulary["ruleUnknown"]
+
+
+def test_ngram_table(tmp_path, model):
+    path = str(tmp_path / "model.ctpnb")
+    save_binary_model(model, path)
+    vocabulary = load_binary_model(path).transformer.vocabulary
+    assert isinstance(vocabulary, MappedVocabulary)
+    assert vocabulary.ngrams is not None
+
+    tokens, codes = ngram_codes(list(vocabulary))
+    assert tokens == ["ruleDateTime", "ruleNamedHour", "ruleTime", "ruleToday", "ruleÄ"]
+    assert vocabulary.ngrams.tokens == tokens
+    assert list(vocabulary.ngrams.codes) == codes
+    assert list(vocabulary.ngrams.weights) == model.estimator.log_odds()[1]
+    # "ruleToday ruleTime" in base 6
+    assert codes[vocabulary["ruleToday ruleTime"]] == 4 * 6 + 3
+
+    # the index of a mapped model is built from the table
+    index = _NgramIndex(load_binary_model(path))
+    reference = _NgramIndex(model)
+    assert index._token_ids == reference._token_ids
+    assert index._weights == reference._weights
+    assert index.prior == reference.prior
+
+
+def test_save_unfitted(tmp_path):
+    model = CTParsePipeline(CountVectorizer((1, 1)), MultinomialNaiveBayes())
+    with pytest.raises(ValueError):
+        save_binary_model(model, str(tmp_path / "model.ctpnb"))
+
+
+def test_load_invalid(tmp_path, model):
+    path = str(tmp_path / "model.pbz")
+    save_naive_bayes(model, path)
+    assert not is_binary_model(path)
+    with pytest.raises(ValueError):
+        load_binary_model(path)
+
+    path = str(tmp_path / "model.ctpnb")
+    save_binary_model(model, path)
+    with open(path, "r+b") as fd:
+        data = fd.read()
+        fd.seek(len(MAGIC))
+        fd.write(b"\xff\xff")
+    with pytest.raises(ValueError):
+        load_binary_model(path)
+
+    with open(path, "wb") as fd:
+        fd.write(data[:-1])
+    with pytest.raises(ValueError):
+        load_binary_model(path)
+
+
+def test_scorer_from_binary_model(tmp_path, model):
+    pickled = str(tmp_path / "model.pbz")
+    binary = str(tmp_path / "model.ctpnb")
+    save_naive_bayes(model, pickled)
+    save_binary_model(model, binary)
+    scorer = NaiveBayesScorer.from_model_file(binary)
+    reference = NaiveBayesScorer.from_model_file(pickled)
+
+    pp = PartialParse((Time(), Time()), ("ruleToday", "ruleTime"))
+    pp.prod[0].mstart = 0
+    pp.prod[1].mend = 2
+    ts = datetime(2019, 1, 1)
+    assert scorer.score("ab", ts, pp) == reference.score("ab", ts, pp)
+    assert scorer.score_batch("ab", ts, [pp]) == reference.score_batch("ab", ts, [pp])
+
+    # memory mapped scorers are pickled by reference to their model file
+    unpickled = pickle.loads(pickle.dumps(scorer))
+    assert unpickled.score("ab", ts, pp) == scorer.score("ab", ts, pp)
+    pickle.loads(pickle.dumps(reference))
+
+
+def test_default_binary_model():
+    from ctparse.loader import DEFAULT_BINARY_MODEL_FILE, DEFAULT_MODEL_FILE
+
+    binary = NaiveBayesScorer.from_model_file(DEFAULT_BINARY_MODEL_FILE)
+    pickled = NaiveBayesScorer.from_model_file(DEFAULT_MODEL_FILE)
+    assert binary._model.transformer.vocabulary is not None
+    assert dict(binary._model.transformer.vocabulary) == (
+        pickled._model.transformer.vocabulary
+    )
+    X_test = [["ruleToday"], X[0], X[1]]
+    assert binary._model.predict_log_proba(X_test) == (
+        pickled._model.predict_log_proba(X_test)
+    )
@@ -0,0 +1,102 @@
+import bz2
+import pickle
+
+import pytest
+
+from ctparse.count_vectorizer import CountVectorizer
+from ctparse.loader import DEFAULT_MODEL_FILE
+from ctparse.nb_estimator import MultinomialNaiveBayes
+from ctparse.pipeline import CTParsePipeline
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from ctparse import nb_numpy  # noqa: E402
+
+X = [
+    ["a", "b", "c"],
+    ["a", "b", "a", "b"],
+    ["1", "b"],
+    ["c", "a", "b", "b", "c"],
+    ["b", "b"],
+]
+y = [1, -1, 1, -1, 1]
+
+
+def test_feature_matrix():
+    cv = CountVectorizer((1, 2))
+    X_sparse = nb_numpy.fit_transform(cv, X)
+    X_dicts = CountVectorizer((1, 2)).fit_transform(X)
+    assert cv.vocabulary
+    assert X_sparse.shape == (len(X), len(cv.vocabulary))
+    for row, x in zip(X_sparse.toarray(), X_dicts):
+        assert {i: c for i, c in enumerate(row) if c} == {
+            i: c for i, c in x.items() if c
+        }
+
+    X_sparse = nb_numpy.transform(cv, [["a", "d", "a"], []])
+    assert X_sparse.toarray()[0, cv.vocabulary["a"]] == 2
+    assert X_sparse[0].sum() == 2
+    assert X_sparse[1].sum() == 0
+
+    with pytest.raises(ValueError):
+        nb_numpy.transform(CountVectorizer((1, 1)), X)
+
+
+def test_fit_predict():
+    model = MultinomialNaiveBayes(alpha=0.5).fit(
+        CountVectorizer((1, 3)).fit_transform(X), y
+    )
+    cv = CountVectorizer((1, 3))
+    model_np = nb_numpy.fit(
+        MultinomialNaiveBayes(alpha=0.5), nb_numpy.fit_transform(cv, X), y
+    )
+    assert model_np.class_prior == model.class_prior
+    for cls in ("negative_class", "positive_class"):
+        assert isinstance(model_np.log_likelihood[cls], list)
+        assert model_np.log_likelihood[cls] == pytest.approx(model.log_likelihood[cls])
+
+    X_test = X + [["a", "d"], ["d"]]
+    pred = model.predict_log_probability(cv.transform(X_test))
+    pred_np = nb_numpy.predict_log_probability(model, nb_numpy.transform(cv, X_test))
+    assert pred_np.shape == (len(X_test), 2)
+    for p, p_np in zip(pred, pred_np):
+        assert tuple(p_np) == pytest.approx(p)
+
+
+@pytest.mark.parametrize("use_numpy", [None, True, False])
+def test_pipeline(use_numpy):
+    reference = CTParsePipeline(
+        CountVectorizer((1, 3)), MultinomialNaiveBayes(), use_numpy=False
+    ).fit(X, y)
+    pipeline = CTParsePipeline(
+        CountVectorizer((1, 3)), MultinomialNaiveBayes(), use_numpy=use_numpy
+    ).fit(X, y)
+    assert pipeline.transformer.vocabulary == reference.transformer.vocabulary
+
+    X_test = X + [["a", "d"]]
+    pred = pipeline.predict_log_proba(X_test)
+    assert all(isinstance(p, tuple) for p in pred)
+    for p, p_ref in zip(pred, reference.predict_log_proba(X_test)):
+        assert p == pytest.approx(p_ref)
+
+
+def test_pipeline_pickled_before_numpy():
+    with bz2.open(DEFAULT_MODEL_FILE, "rb") as fd:
+        model = pickle.load(fd)
+    assert "use_numpy" not in vars(model)
+    assert model._use_numpy()
+    X_test = [["ruleToday"], ["ruleToday", "ruleTime"]]
+    model.use_numpy = False
+    pred = model.predict_log_proba(X_test)
+    model.use_numpy = None
+    for p_np, p in zip(model.predict_log_proba(X_test), pred):
+        assert p_np == pytest.approx(p)
+
+
+def test_pipeline_without_numpy(monkeypatch):
+    monkeypatch.setattr("ctparse.pipeline.HAS_NUMPY", False)
+    pipeline = CTParsePipeline(CountVectorizer((1, 3)), MultinomialNaiveBayes())
+    assert not pipeline._use_numpy()
+    pipeline.fit(X, y)
+    assert isinstance(pipeline.estimator.log_likelihood["positive_class"], list)
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+from datetime import datetime
+from typing import Any, List, Optional
+
+import pytest
+
+from ctparse import parallel
+from ctparse.corpus import load_timeparse_corpus
+from ctparse.ctparse import CTParse, ctparse_batch
+from ctparse.parallel import ParallelParser
+from ctparse.scorer import DummyScorer
+
+CORPUS_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "datasets", "timeparse_corpus.json"
+)
+
+
+def test_parallel_parser():
+    items = [(e.text, e.ts) for e in load_timeparse_corpus(CORPUS_FILE)[::50]]
+    expected = ctparse_batch(items, timeout=0)
+    with ParallelParser(processes=2, chunksize=3, timeout=0) as parser:
+        parses = list(parser.parse(iter(items)))
+        assert list(parser.parse([])) == []
+    assert len(parses) == len(items)
+    for parse, exp in zip(parses, expected):
+        if exp is None:
+            assert parse is None
+        else:
+            assert parse
+            assert parse.resolution == exp.resolution
+            assert parse.production == exp.production
+            assert parse.score == exp.score
+
+
+def test_parallel_parser_scorer():
+    items = [("May 5th 2:30 pm", None), ("nothing to see here", None)]
+    with ParallelParser(processes=1, scorer=DummyScorer()) as parser:
+        parses = list(parser.parse(items))
+    assert parses[0] and parses[0].score == 0.0
+    assert parses[1] is None
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"beam_width": 3, "max_expansions": 20}, {"chart": True}],
+)
+def test_parallel_parser_search(kwargs):
+    # the search parameters are passed on to the workers
+    items = [(e.text, e.ts) for e in load_timeparse_corpus(CORPUS_FILE)[::100]]
+    expected = ctparse_batch(items, timeout=0, **kwargs)
+    with ParallelParser(processes=1, timeout=0, **kwargs) as parser:
+        parses = list(parser.parse(items))
+
+    def _key(parses: List[Optional[CTParse]]) -> List[Any]:
+        return [p and (p.resolution, p.production) for p in parses]
+
+    assert _key(parses) == _key(expected)
+    # and make a difference
+    assert _key(expected) != _key(ctparse_batch(items, timeout=0))
+
+
+@pytest.mark.parametrize(
+    "start_method",
+    [m for m in ("fork", "spawn") if m in multiprocessing.get_all_start_methods()],
+)
+def test_parallel_parser_start_method(start_method):
+    items = [("May 5th 2:30 pm", datetime(2020, 1, 1))]
+    expected = ctparse_batch(items)
+    with ParallelParser(processes=1, start_method=start_method) as parser:
+        parses = list(parser.parse(items))
+    assert parses[0] and expected[0]
+    assert parses[0].resolution == expected[0].resolution
+    assert parses[0].score == expected[0].score
+
+
+def test_init_worker(monkeypatch):
+    # the default scorer is loaded in each worker, whatever the start method
+    calls = []  # type: List[None]
+    monkeypatch.setattr(parallel, "preload", lambda: calls.append(None))
+    parallel._init_worker({"scorer": None})
+    assert calls == [None]
+    parallel._init_worker({"scorer": DummyScorer()})
+    assert calls == [None]
+    parallel._worker_kwargs.clear()
+
+
+def test_parallel_parser_chunksize():
+    with pytest.raises(ValueError):
+        ParallelParser(chunksize=0)
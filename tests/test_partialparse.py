@@ -1,12 +1,20 @@
 import datetime
-from typing import Any, Callable
+import random
+from typing import Any, Callable, Dict, Generator, List, Sequence, Tuple, TypeVar
 
 import pytest
 import regex
 
-from ctparse.partial_parse import PartialParse, _seq_match
+from ctparse.partial_parse import (
+    BeamFrontier,
+    Frontier,
+    PartialParse,
+    Rules,
+)
 from ctparse.types import RegexMatch, Time
 
+T = TypeVar("T")
+
 
 def test_partial_parse() -> None:
     match_a = regex.match("(?<R1>a)", "ab")
@@ -20,20 +28,251 @@ def test_partial_parse() -> None:
     assert len(pp.rules) == 2
 
     assert isinstance(pp.score, float)
+    assert pp.score_state is None
 
     def mock_rule(ts: datetime.datetime, a: Time) -> Time:
         return Time()
 
+    pp.score_state = "state"
     pp2 = pp.apply_rule(
         datetime.datetime(day=1, month=1, year=2015), mock_rule, "mock_rule", (0, 1)
     )
 
     assert pp != pp2
+    assert pp2 is not None
+    assert pp2.score_state == "state"
 
     with pytest.raises(ValueError):
         PartialParse((), ())
 
 
+def test_partial_parse_rule_cache() -> None:
+    match_a = regex.match("(?<R1>a)", "ab")
+    match_b = next(regex.finditer("(?<R2>b)", "ab"))
+    rule_cache = {}  # type: Dict[Tuple[int, ...], Rules]
+
+    pp = PartialParse.from_regex_matches(
+        (RegexMatch(1, match_a), RegexMatch(2, match_b)), rule_cache
+    )
+    assert rule_cache == {(1, 2): pp.applicable_rules}
+
+    pp2 = PartialParse.from_regex_matches(
+        (RegexMatch(1, match_a), RegexMatch(2, match_b)), rule_cache
+    )
+    assert pp2.applicable_rules is pp.applicable_rules
+
+
+def test_apply_rule_lazy() -> None:
+    match_a = regex.match("(?<R1>a)", "ab")
+    match_b = next(regex.finditer("(?<R2>b)", "ab"))
+    ts = datetime.datetime(2015, 1, 1)
+
+    def mock_rule(ts: datetime.datetime, *args: Any) -> Time:
+        return Time(day=len(args)).update_span(*args)
+
+    a, b = RegexMatch(1, match_a), RegexMatch(2, match_b)
+    pp = PartialParse((a, b), (1, 2))
+    pp1 = pp.apply_rule(ts, mock_rule, "rule1", (1, 2))
+    assert pp1 is not None
+    pp2 = pp1.apply_rule(ts, mock_rule, "rule2", (0, 2))
+    assert pp2 is not None
+    # nothing is built until accessed, except for the prod of pp1 that pp2 was
+    # produced from
+    assert pp2._prod is None and pp2._rules is None and pp1._rules is None
+    assert pp2.rules_since(1) == [2, "rule1", "rule2"]
+    assert pp2.rules_since(3) == ["rule2"]
+    assert pp2.rules_since(4) == []
+    assert pp2.first is pp2.last
+    assert pp2.max_covered_chars == 2
+    assert pp2._prod is None and pp2._rules is None and pp1._rules is None
+
+    assert pp2.prod == (Time(day=2),)
+    assert pp2.rules == (1, 2, "rule1", "rule2")
+    assert pp1.prod == (a, Time(day=1))
+    assert pp1.first is a
+    assert pp1.rules == (1, 2, "rule1")
+    assert pp2.rules_since(1) == [2, "rule1", "rule2"]
+
+
+def test_prod_key() -> None:
+    match_a = regex.match("(?<R1>a)", "ab")
+    match_b = next(regex.finditer("(?<R2>b)", "ab"))
+    ts = datetime.datetime(2015, 1, 1)
+
+    def mock_rule(ts: datetime.datetime, a: RegexMatch) -> Time:
+        return Time(day=a.id)
+
+    pp = PartialParse((RegexMatch(1, match_a), RegexMatch(2, match_b)), (1, 2))
+    assert pp.prod_key == (0, 1)
+    # derived keys are computed incrementally, equal productions get the
+    # same key although their artifacts are different objects
+    pp1 = pp.apply_rule(ts, mock_rule, "mock_rule", (0, 1))
+    pp2 = pp.apply_rule(ts, mock_rule, "mock_rule", (1, 2))
+    assert pp1 is not None and pp2 is not None
+    assert pp1.prod_key == (2, 1)
+    assert pp2.prod_key == (0, 3)
+    pp12 = pp1.apply_rule(ts, mock_rule, "mock_rule", (1, 2))
+    pp21 = pp2.apply_rule(ts, mock_rule, "mock_rule", (0, 1))
+    assert pp12 is not None and pp21 is not None
+    assert pp12.prod == pp21.prod
+    assert pp12.prod_key == pp21.prod_key == (2, 3)
+
+    fresh = PartialParse(pp12.prod, pp12.rules)
+    fresh.artifact_ids = pp.artifact_ids
+    assert fresh.prod_key == pp12.prod_key
+
+
+@pytest.mark.parametrize("max_size", [0, 1, 5])
+def test_frontier(max_size: int) -> None:
+    # same order as a list that is sorted after each extension, truncated to
+    # the last max_size elements and popped from the end
+    rng = random.Random(42)
+    frontier = Frontier(max_size)
+    stack = []  # type: List[PartialParse]
+    for _ in range(300):
+        if stack and rng.random() < 0.5:
+            assert frontier.pop() is stack.pop()
+        else:
+            new = []
+            for _ in range(rng.randint(0, 4)):
+                time = Time()
+                time.mend = rng.randint(1, 3)
+                pp = PartialParse((time,), ("rule",))
+                # few distinct scores to get many ties
+                pp.score = rng.choice([-1.0, 0.0, 0.5])
+                new.append(pp)
+            if rng.random() < 0.5:
+                frontier.extend(new)
+                stack.extend(new)
+                stack.sort()
+                stack = stack[-max_size:]
+            else:
+                for pp in new:
+                    stack.append(pp)
+                    stack.sort()
+                    stack = stack[-max_size:]
+                    # False iff evicted right away
+                    assert frontier.push(pp) is any(s is pp for s in stack)
+        assert len(frontier) == len(stack)
+    while stack:
+        assert frontier.pop() is stack.pop()
+    assert not frontier
+    with pytest.raises(IndexError):
+        frontier.pop()
+
+
+@pytest.mark.parametrize("beam_width", [1, 2, 5])
+def test_beam_frontier(beam_width: int) -> None:
+    # the same as a list of partial parses in the order they were added, from
+    # which the smallest ones of a span in excess of beam_width are evicted
+    # and that is sorted before popping from the end
+    def span(pp: PartialParse) -> Tuple[int, int]:
+        return pp.first.mstart, pp.last.mend
+
+    rng = random.Random(42)
+    frontier = BeamFrontier(beam_width)
+    stack = []  # type: List[PartialParse]
+    for _ in range(500):
+        if stack and rng.random() < 0.4:
+            stack.sort()
+            assert frontier.pop() is stack.pop()
+        else:
+            time = Time()
+            time.mstart = rng.randint(0, 2)
+            time.mend = rng.randint(3, 4)
+            pp = PartialParse((time,), ("rule",))
+            pp.score = rng.choice([-1.0, 0.0, 0.5])
+            stack.append(pp)
+            beam = sorted(
+                (s for s in stack if span(s) == span(pp)), key=lambda s: s.score
+            )
+            evicted = beam[: max(len(beam) - beam_width, 0)]
+            stack = [s for s in stack if not any(s is e for e in evicted)]
+            # False iff evicted right away
+            assert frontier.push(pp) is any(s is pp for s in stack)
+        assert len(frontier) == len(stack)
+    stack.sort()
+    while stack:
+        assert frontier.pop() is stack.pop()
+    assert not frontier
+
+    with pytest.raises(ValueError):
+        BeamFrontier(0)
+
+
+def _seq_match(
+    seq: Sequence[T], pat: Sequence[Callable[[T], bool]], offset: int = 0
+) -> Generator[List[int], None, None]:
+    # :param seq: a list of intermediate productions, either of type
+    # RegexMatch or some other Artifact
+    #
+    # :param pat: a list of rule patterns to be matched, i.e. either a
+    # RegexMatch or a callable
+    #
+    # NOTE: rule.applicable_rules implements the same check for all rules at
+    # once on sequences of RegexMatch objects; this is the reference it is
+    # tested against.
+    #
+    # Determine whether the pattern pat matches the sequence seq and
+    # return a list of lists, where each sub-list contains those
+    # indices where the RegexMatch objects in pat are located in seq.
+    #
+    # A pattern pat only matches seq, iff each RegexMatch in pat is in
+    # seq in the same order and iff between two RegexMatches aligned
+    # to seq there is at least one additional element in seq. Reason:
+    #
+    # * Rule patterns never have two consequitive RegexMatch objects.
+    #
+    # * Hence there must be some predicate/dimension between two
+    # * RegexMatch objects.
+    #
+    # * For the whole pat to match there must then be at least one
+    #  element in seq that can product this intermediate bit
+    #
+    # If pat does not start with a RegexMatch then there must be at
+    # least one element in seq before the first RegexMatch in pat that
+    # is alignes on seq. Likewise, if pat does not end with a
+    # RegexMatch, then there must be at least one additional element
+    # in seq to match the last non-RegexMatch element in pat.
+    #
+    # STRONG ASSUMPTIONS ON ARGUMENTS: seq and pat do not contain
+    # consequiteve elements which are both of type RegexMatch! Callers
+    # obligation to ensure this!
+
+    if not pat:
+        # if pat is empty yield the empty match
+        yield []
+    elif not seq or not pat:
+        # if either seq or pat is empty there will be no match
+        return
+    elif pat[-1].__name__ != "_regex_match":
+        # there must be at least one additional element in seq at the
+        # end
+        yield from _seq_match(seq[:-1], pat[:-1], offset)
+    elif len(pat) > len(seq):
+        # if pat is longer than seq it cannot match
+        return
+    else:
+        p1 = pat[0]
+        # if p1 is not a RegexMatch, then continue on next pat and
+        # advance sequence by one
+        if p1.__name__ != "_regex_match":
+            yield from _seq_match(seq[1:], pat[1:], offset + 1)
+        else:
+            # Get number of RegexMatch in p
+            n_regex = sum(1 for p in pat if p.__name__ == "_regex_match")
+            # For each occurance of RegexMatch pat[0] in seq
+            for iseq, s in enumerate(seq):
+                # apply _regex_match check
+                if p1(s):
+                    # for each match of pat[1:] in seq[iseq+1:], yield a result
+                    for subm in _seq_match(seq[iseq + 1 :], pat[1:], offset + iseq + 1):
+                        if len(subm) == n_regex - 1:
+                            # only yield if all subsequent RegexMatch
+                            # have been aligned!
+                            yield [iseq + offset] + subm
+
+
 def test_seq_match() -> None:
     # NOTE: we are testing a private function because the algorithm
     # is quite complex
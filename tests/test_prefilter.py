@@ -0,0 +1,68 @@
+import pytest
+import regex
+
+from ctparse.prefilter import Clause, may_match, requirements, text_features
+
+
+@pytest.mark.parametrize(
+    "pattern,expected",
+    [
+        ("heute", ((("heute",), False),)),
+        ("heute|today", ((("heute", "today"), False),)),
+        ("tage?", ((("tag",), False),)),
+        (r"n[aä]cht", ((("nacht", "nächt"), False),)),
+        (r"(?<!\d)\d+\s*uhr", (((), True), (("uhr",), False))),
+        (r"(gegen){e<=1}", ((("ge",), False),)),
+        (r"(am){e<=2}", ()),
+        (r"(?&_day)\.", ((("10", "20", "30", "31"), True), ((".",), False))),
+        # anything unknown means no requirements
+        (r"(?P=x)", ()),
+        (r"[a-z]+", ()),
+        (r"heute|\w+", ()),
+        # escapes followed by a code point, name or group number
+        (r"\x41bc", ()),
+        (r"\u00e4bc", ()),
+        (r"\U000000e4bc", ()),
+        (r"\N{LATIN SMALL LETTER A}bc", ()),
+        (r"\0123", ()),
+        (r"(a)\1bc", ()),
+        (r"[\x41]bc", ()),
+        (r"\pLuhr", ((("uhr",), False),)),
+    ],
+)
+def test_requirements(pattern, expected) -> None:
+    reqs = requirements(pattern, {"_day": r"[012]?[1-9]|10|20|30|31"})
+    assert {(tuple(sorted(c.literals)), c.digit) for c in reqs} == set(expected)
+
+
+def test_may_match() -> None:
+    reqs = (Clause(frozenset(["heute", "today"]), False), Clause(frozenset(), True))
+    assert may_match(reqs, text_features("HEUTE um 5"))
+    assert not may_match(reqs, text_features("heute um fünf"))
+    assert not may_match(reqs, text_features("morgen um 5"))
+    assert may_match((), text_features(""))
+
+
+@pytest.mark.parametrize(
+    "pattern,texts",
+    [
+        (
+            r"(übermorgen){e<=1}",
+            ["Übermorgen", "ubermorgen", "übermorgn", "bermorgen"],
+        ),
+        (r"(?<!\d)(?P<h>\d\d?)\s*(uhr|h)", ["um 8 Uhr", "8h", "20UHR"]),
+        (
+            r"(ende (des )?jahr(es)?){e<=1}",
+            ["ende jahres", "Ende des Jahr", "endejahr"],
+        ),
+        (r"stra(ß|ss)e", ["STRASSE", "straße", "Strasse"]),
+        (r"\x41bc", ["Abc"]),
+        (r"\pLuhr", ["8 auhr", "Äuhr"]),
+    ],
+)
+def test_requirements_are_conservative(pattern, texts) -> None:
+    rr = regex.compile("(?i)" + pattern, regex.VERSION1 | regex.BESTMATCH)
+    reqs = requirements(pattern)
+    for txt in texts:
+        assert rr.search(txt)
+        assert may_match(reqs, text_features(txt))
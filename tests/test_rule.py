@@ -1,7 +1,25 @@
+import random
 from unittest import TestCase
 import regex
 from ctparse.types import RegexMatch, Artifact
-from ctparse.rule import dimension, predicate, regex_match, rule
+from ctparse.rule import (
+    _reads_first_arg,
+    _rule_positions_by_shape,
+    _rule_skeletons,
+    _rules_by_first_shape,
+    _ts_dependent_rules,
+    applicable_rules,
+    dimension,
+    predicate,
+    regex_match,
+    rule,
+    rules,
+    rule_positions,
+    rules_starting_with,
+    _str_regex,
+)
+from ctparse.types import Interval, Time
+from tests.test_partialparse import _seq_match
 
 
 class ClassA(Artifact):
@@ -42,3 +60,159 @@ class TestRule(TestCase):
     def test_predicate(self):
         self.assertTrue(predicate("predA")(ClassA()))
         self.assertFalse(predicate("predA")(ClassB()))
+
+    def test_reads_first_arg(self):
+        def uses_ts(ts, a):
+            return a if ts.year > 2000 else None
+
+        def uses_ts_nested(ts, a):
+            return [x for x in [a] if ts]
+
+        def ignores_ts(ts, a):
+            return a
+
+        self.assertTrue(_reads_first_arg(uses_ts))
+        self.assertTrue(_reads_first_arg(uses_ts_nested))
+        self.assertFalse(_reads_first_arg(ignores_ts))
+
+    def test_ts_dependent_rules(self):
+        self.assertIn("ruleTomorrow", _ts_dependent_rules)
+        self.assertIn("ruleLatentDOW", _ts_dependent_rules)
+        self.assertNotIn("ruleHHMM", _ts_dependent_rules)
+        self.assertNotIn("ruleDDMMYYYY", _ts_dependent_rules)
+
+    def test_applicable_rules(self):
+        # same rules as checking each rule pattern with _seq_match
+        def make_rm(r_id: int) -> RegexMatch:
+            return RegexMatch(r_id, regex.match("(?<R{}>a)".format(r_id), "a"))
+
+        rng = random.Random(42)
+        skeletons = list(_rule_skeletons.values())
+        for _ in range(500):
+            # sequences made up from the regexes of a few rules and others
+            regex_ids = [rng.choice([1, 2, 3]) for _ in range(rng.randint(0, 3))]
+            for skeleton in rng.sample(skeletons, 2):
+                for r_id, _gap in skeleton[0]:
+                    regex_ids.insert(rng.randint(0, len(regex_ids)), r_id)
+            prod = [make_rm(r_id) for r_id in regex_ids]
+            expected = [
+                name
+                for name, r in rules.items()
+                if next(_seq_match(prod, r[1]), None) is not None
+            ]
+            self.assertEqual(list(applicable_rules(tuple(regex_ids))), expected)
+
+    def test_applicable_rules_reregistered(self):
+        try:
+
+            @rule(r"applicablerulea", dimension(ClassA))
+            def ruleTestApplicable(ts, a, b):
+                return None
+
+            self.assertIn(
+                "ruleTestApplicable",
+                applicable_rules((_str_regex["applicablerulea"], 1)),
+            )
+
+            @rule(dimension(ClassA), dimension(ClassA))
+            def ruleTestApplicable(ts, a, b):  # noqa: F811
+                return None
+
+            self.assertNotIn("ruleTestApplicable", applicable_rules((1,)))
+            self.assertIn("ruleTestApplicable", applicable_rules((1, 2)))
+        finally:
+            del rules["ruleTestApplicable"]
+
+    def test_predicate_by_shape(self):
+        # results are memoized per shape, not per artifact
+        isDOM = predicate("isDOM")
+        self.assertTrue(isDOM(Time(day=1)))
+        self.assertTrue(isDOM(Time(day=2)))
+        self.assertFalse(isDOM(Time(month=1, day=1)))
+        self.assertFalse(isDOM(Interval()))
+        self.assertEqual(isDOM.__name__, "_predicate")
+
+    def test_rules_starting_with(self):
+        r_id = min(_str_regex.values())
+        m = next(regex.finditer("(?P<R{}>x)".format(r_id), "x"))
+        for a in [
+            Time(day=1),
+            Time(year=2020, month=1, day=1, hour=1),
+            Interval(Time(hour=1), Time(hour=2)),
+            Interval(None, Time(day=1)),
+            RegexMatch(r_id, m),
+            ClassA(),
+        ]:
+            expected = {name for name, r in rules.items() if r[1] and r[1][0](a)}
+            self.assertEqual(rules_starting_with(a), expected)
+
+        # rules registered later are taken into account
+        try:
+
+            @rule(dimension(ClassB))
+            def ruleTestStartingWith(ts, a):
+                return None
+
+            self.assertIn("ruleTestStartingWith", rules_starting_with(ClassB()))
+        finally:
+            del rules["ruleTestStartingWith"]
+
+    def test_rule_positions(self):
+        r_id = min(_str_regex.values())
+        m = next(regex.finditer("(?P<R{}>x)".format(r_id), "x"))
+        for a in [
+            Time(day=1),
+            Interval(Time(hour=1), Time(hour=2)),
+            RegexMatch(r_id, m),
+            ClassA(),
+        ]:
+            expected = [
+                (name, i)
+                for name, r in rules.items()
+                for i, p in enumerate(r[1])
+                if p(a)
+            ]
+            self.assertEqual(list(rule_positions(a)), expected)
+            self.assertEqual(
+                {name for name, i in rule_positions(a) if i == 0},
+                rules_starting_with(a),
+            )
+
+    def test_custom_predicates(self):
+        # predicates other than the built-in ones are not memoized per shape
+        def isMorning(t: Artifact) -> bool:
+            return isinstance(t, Time) and t.hour is not None and t.hour < 12
+
+        try:
+
+            @rule(isMorning, dimension(Time))
+            def ruleTestCustomPredicate(ts, a, b):
+                return None
+
+            morning, evening = Time(hour=8), Time(hour=20)
+            self.assertEqual(morning.shape, evening.shape)
+            for _ in range(2):
+                self.assertIn("ruleTestCustomPredicate", rules_starting_with(morning))
+                self.assertNotIn(
+                    "ruleTestCustomPredicate", rules_starting_with(evening)
+                )
+                self.assertEqual(
+                    [
+                        i
+                        for name, i in rule_positions(morning)
+                        if name == "ruleTestCustomPredicate"
+                    ],
+                    [0, 1],
+                )
+                self.assertEqual(
+                    [
+                        i
+                        for name, i in rule_positions(evening)
+                        if name == "ruleTestCustomPredicate"
+                    ],
+                    [1],
+                )
+        finally:
+            del rules["ruleTestCustomPredicate"]
+            _rules_by_first_shape.clear()
+            _rule_positions_by_shape.clear()
@@ -2,8 +2,16 @@ import datetime
 import random
 import bz2
 import pickle
+from typing import List, Union
 
-from ctparse.nb_scorer import NaiveBayesScorer, train_naive_bayes, save_naive_bayes
+import pytest
+
+from ctparse.nb_scorer import (
+    NaiveBayesScorer,
+    _NgramIndex,
+    train_naive_bayes,
+    save_naive_bayes,
+)
 from ctparse.partial_parse import PartialParse
 from ctparse.scorer import DummyScorer, RandomScorer
 from ctparse.count_vectorizer import CountVectorizer
@@ -18,6 +26,13 @@ def test_dummy():
 
     assert scorer.score("a", datetime.datetime(2019, 1, 1), pp) == 0.0
     assert scorer.score_final("a", datetime.datetime(2019, 1, 1), pp, pp.prod[0]) == 0.0
+    assert scorer.score_batch("a", datetime.datetime(2019, 1, 1), [pp, pp]) == [
+        0.0,
+        0.0,
+    ]
+    assert scorer.score_final_batch(
+        "a", datetime.datetime(2019, 1, 1), pp, pp.prod
+    ) == [0.0, 0.0]
 
 
 def test_random():
@@ -57,6 +72,24 @@ def test_nbscorer():
         <= 1.0
     )
 
+    pp2 = PartialParse((Time(),), ("rule1",))
+    pp2.prod[0].mend = 1
+    batch = scorer.score_batch("ab", datetime.datetime(2019, 1, 1), [pp, pp2])
+    assert batch == [
+        scorer.score("ab", datetime.datetime(2019, 1, 1), pp),
+        scorer.score("ab", datetime.datetime(2019, 1, 1), pp2),
+    ]
+    assert scorer.score_batch("ab", datetime.datetime(2019, 1, 1), []) == []
+
+    final_batch = scorer.score_final_batch(
+        "ab", datetime.datetime(2019, 1, 1), pp, pp.prod
+    )
+    assert final_batch == [
+        scorer.score_final("ab", datetime.datetime(2019, 1, 1), pp, pp.prod[0]),
+        scorer.score_final("ab", datetime.datetime(2019, 1, 1), pp, pp.prod[1]),
+    ]
+    assert scorer.score_final_batch("ab", datetime.datetime(2019, 1, 1), pp, []) == []
+
 
 def test_naive_bayes_from_file(tmp_path):
     nb = NaiveBayesScorer(
@@ -73,3 +106,65 @@ def test_save_naive_bayes(tmp_path):
     path = tmp_path / "model.pkl"
     model = CTParsePipeline(CountVectorizer((1, 1)), MultinomialNaiveBayes())
     save_naive_bayes(model, path)
+
+
+@pytest.mark.parametrize("ngram_range", [(1, 1), (1, 3), (2, 3)])
+def test_ngram_index(ngram_range):
+    X = [
+        ("a", "b", "c"),
+        ("a", "b", "a", "b"),
+        ("1", "b"),
+        ("c", "a", "b", "b", "c"),
+        ("b", "b"),
+    ]
+    y = [True, False, True, False, True]
+    model = CTParsePipeline(CountVectorizer(ngram_range), MultinomialNaiveBayes()).fit(
+        X, [1 if y_i else -1 for y_i in y]
+    )
+    index = _NgramIndex(model)
+
+    # "d" and 2 are unknown to the model
+    tokens = ["a", "b", "c", "d", 1, 2]  # type: List[Union[int, str]]
+    rng = random.Random(42)
+    for _ in range(200):
+        rules = [rng.choice(tokens) for _ in range(rng.randint(0, 8))]
+        pred = model.predict_log_proba([[str(r) for r in rules]])[0]
+        state = index.scan(rules)
+        assert index.log_odds(state) == pytest.approx(pred[1] - pred[0])
+        # scanning incrementally gives the same result
+        for n in range(len(rules)):
+            assert index.scan(rules, index.scan(rules[:n]))[1:3] == state[1:3]
+            assert index.extend(rules[n:], index.scan(rules[:n]))[1:3] == state[1:3]
+
+    # the score of a production does not depend on whether it is computed
+    # incrementally from the score state of its parent
+    scorer = NaiveBayesScorer(model)
+    ts = datetime.datetime(2019, 1, 1)
+    pp = PartialParse((Time(), Time()), ("a", "b"))
+    pp.prod[1].mend = 2
+    scorer.score("ab", ts, pp)
+    assert pp.score_state is not None
+    child = pp.apply_rule(ts, lambda ts, t: Time(), "c", (0, 1))
+    assert child is not None
+    fresh = PartialParse(child.prod, child.rules)
+    assert scorer.score("ab", ts, child) == scorer.score("ab", ts, fresh)
+
+    with pytest.raises(ValueError):
+        _NgramIndex(CTParsePipeline(CountVectorizer((1, 1)), MultinomialNaiveBayes()))
+
+
+def test_naive_bayes_log_odds():
+    X = [("a", "b"), ("a",), ("b",), ("a", "b", "a", "b")]
+    y = [False, True, True, False]
+    model = train_naive_bayes(X, y)
+
+    prior, weights = model.estimator.log_odds()
+    assert prior == model.estimator.class_prior[1] - model.estimator.class_prior[0]
+    assert len(weights) == len(model.estimator.log_likelihood["positive_class"])
+
+    X_test = model.transformer.transform([["a", "b", "b"], ["c"]])
+    log_odds = [
+        prior + sum(weights[idx] * cnt for idx, cnt in x.items()) for x in X_test
+    ]
+    for lo, pred in zip(log_odds, model.estimator.predict_log_probability(X_test)):
+        assert lo == pytest.approx(pred[1] - pred[0])
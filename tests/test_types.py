@@ -1,7 +1,9 @@
+import pickle
 from unittest import TestCase
 import regex
 from datetime import datetime
-from ctparse.types import Artifact, RegexMatch, Time, Interval
+from typing import Any, Dict, List, Tuple
+from ctparse.types import Artifact, Duration, DurationUnit, RegexMatch, Time, Interval
 
 
 class TestArtifact(TestCase):
@@ -40,6 +42,51 @@ class TestArtifact(TestCase):
         self.assertEqual(a1.mend, 100)
         self.assertEqual(len(a1), 90)
 
+    def test_hash(self):
+        a = Time(2017, 12, 12, POD="morning")
+        b = Time(2017, 12, 12, POD="morning")
+        b.update_span(Artifact(), Artifact())
+        self.assertEqual(hash(a), hash(b))
+        # the hash does not change with the span
+        h = hash(a)
+        a2 = Artifact()
+        a2.mend = 10
+        a.update_span(a2)
+        self.assertEqual(hash(a), h)
+        self.assertEqual({a: 1}[Time(2017, 12, 12, POD="morning")], 1)
+        self.assertEqual(
+            hash(Interval(a, None)), hash(Interval(Time(2017, 12, 12, POD="morning")))
+        )
+        # durations are compared and hashed by value and unit as well
+        d = Duration(1, DurationUnit.DAYS)
+        self.assertEqual(d, Duration(1, DurationUnit.DAYS))
+        self.assertNotEqual(d, Duration(2, DurationUnit.DAYS))
+        self.assertNotEqual(d, Duration(1, DurationUnit.NIGHTS))
+        self.assertEqual(hash(d), hash(Duration(1, DurationUnit.DAYS)))
+        self.assertNotEqual(hash(d), hash(Duration(2, DurationUnit.DAYS)))
+
+    def test_slots(self):
+        m = next(regex.finditer(r"(?P<R1>x)", "x"))
+        for a in [
+            Artifact(),
+            RegexMatch(1, m),
+            Time(),
+            Interval(),
+            Duration(1, DurationUnit.DAYS),
+        ]:
+            self.assertFalse(hasattr(a, "__dict__"))
+
+    def test_pickle(self):
+        a = Interval(Time(2017, 12, 12, POD="morning"), Time(hour=1))
+        a.mend = 5
+        hash(a)
+        b = pickle.loads(pickle.dumps(a))
+        self.assertEqual(a, b)
+        self.assertEqual(b.mend, 5)
+        # the cached hash is recomputed after unpickling
+        self.assertIsNone(b._hash)
+        self.assertEqual(hash(a), hash(b))
+
     def test_repr(self):
         a = Artifact()
         self.assertEqual(repr(a), "Artifact[0-0]{}")
@@ -48,6 +95,21 @@ class TestArtifact(TestCase):
         a = Artifact()
         self.assertEqual(a.nb_str(), "Artifact[]{}")
 
+    def test_shape(self):
+        m = next(regex.finditer(r"(?P<R1>x)(?P<R2>y)", "xy"))
+        self.assertEqual(RegexMatch(1, m).shape, RegexMatch(1, m).shape)
+        self.assertNotEqual(RegexMatch(1, m).shape, RegexMatch(2, m).shape)
+        self.assertEqual(Time(day=1).shape, Time(day=2).shape)
+        self.assertNotEqual(Time(day=1).shape, Time(day=1, month=1).shape)
+        self.assertNotEqual(Time().shape, Interval().shape)
+        self.assertEqual(
+            Interval(Time(hour=1), None).shape, Interval(Time(hour=5), None).shape
+        )
+        self.assertNotEqual(
+            Interval(Time(hour=1), None).shape, Interval(None, Time(hour=1)).shape
+        )
+        self.assertNotEqual(Artifact().shape, Time().shape)
+
 
 class TestRegexMatch(TestCase):
     def test_init(self):
@@ -65,6 +127,44 @@ class TestTime(TestCase):
     def test_init(self):
         self.assertIsNotNone(Time())
 
+    def test_predicates_field_combinations(self):
+        # the predicates give the same results as the definitions in terms of
+        # _hasOnly and _hasAtLeast for all combinations of fields set
+        only = {
+            "isDOY": [("month", "day")],
+            "isDOM": [("day",)],
+            "isDOW": [("DOW",)],
+            "isMonth": [("month",)],
+            "isPOD": [("POD",)],
+            "isHour": [("hour",)],
+            "isTOD": [("hour",), ("hour", "minute")],
+            "isDate": [("year", "month", "day")],
+            "isDateTime": [
+                ("year", "month", "day", "hour"),
+                ("year", "month", "day", "hour", "minute"),
+            ],
+            "isYear": [("year",)],
+        }  # type: Dict[str, List[Tuple[str, ...]]]
+        at_least = {
+            "hasDate": ("year", "month", "day"),
+            "hasDOY": ("month", "day"),
+            "hasDOW": ("DOW",),
+            "hasTime": ("hour",),
+            "hasPOD": ("POD",),
+        }
+        values = dict(
+            year=2020, month=1, day=0, hour=0, minute=0, DOW=0, POD="pm"
+        )  # type: Dict[str, Any]
+        for mask in range(1 << len(values)):
+            t = Time(
+                **{f: v for i, (f, v) in enumerate(values.items()) if mask >> i & 1}
+            )
+            for pred, alternatives in only.items():
+                expected = any(t._hasOnly(*fs) for fs in alternatives)
+                self.assertIs(getattr(t, pred), expected, (pred, mask))
+            for pred, fs in at_least.items():
+                self.assertIs(getattr(t, pred), t._hasAtLeast(*fs), (pred, mask))
+
     def test_isDOY(self):
         self.assertTrue(Time(month=1, day=1).isDOY)
         self.assertFalse(Time(year=1).isDOY)